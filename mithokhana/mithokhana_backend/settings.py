@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 import os
 from pathlib import Path
+from django.core.exceptions import ImproperlyConfigured
 from django.utils.translation import gettext_lazy as _
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,6 +46,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'recipes.middleware.StaticFilesMiddleware',
+    'recipes.middleware.ProfilingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware', 
     'django.middleware.common.CommonMiddleware',
@@ -92,6 +95,39 @@ DATABASES = {
 }
 
 
+# One cache shared by every worker process. Cached users, sessions, pages
+# and the version stamps that invalidate in-process tables only work if a
+# write in one process is seen by all of them, so production needs Redis:
+# set REDIS_URL (e.g. redis://127.0.0.1:6379/1). The per-process LocMemCache
+# is only good enough for a single runserver process while DEBUG is on.
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'mithokhana',
+        }
+    }
+elif DEBUG:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+else:
+    raise ImproperlyConfigured("Set REDIS_URL: the cache must be shared between worker processes.")
+
+# Sessions are read from the cache and written through to the database;
+# request.user (with its profile) is cached by recipes.auth
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+AUTHENTICATION_BACKENDS = [
+    'recipes.auth.CachedModelBackend',
+    # Sessions created before the cached backend still name this one
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = '/'  # After login, redirect here
 LOGOUT_REDIRECT_URL = '/login/'
@@ -150,6 +186,30 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 
 STATIC_URL = 'static/'
+STATICFILES_DIRS = [BASE_DIR / 'static']
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# collectstatic writes content-hashed names plus .gz/.br copies of text assets
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'recipes.staticfiles.CompressedManifestStaticFilesStorage'},
+}
+
+# Serve STATIC_ROOT from Django (recipes/middleware.py) when no front-end
+# server does it; runserver already serves static files while DEBUG is on.
+SERVE_STATIC_FILES = not DEBUG
+
+# Background tasks (recipes/queue.py). Run the worker with `manage.py run_tasks`;
+# set True (e.g. in tests) to run tasks in-process once the request commits.
+TASKS_ALWAYS_EAGER = False
+
+# Request profiling (recipes/middleware.py), off unless asked for. Profiles a
+# random PROFILE_SAMPLE_RATE share of requests plus every request whose path
+# matches PROFILE_PATH_PATTERN (a regex); summarize with `manage.py profile_report`.
+PROFILE_REQUESTS = False
+PROFILE_SAMPLE_RATE = 0.01
+PROFILE_PATH_PATTERN = None
+PROFILE_DIR = BASE_DIR / 'profiles'
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -1,24 +1,64 @@
 from django.contrib import admin
 from .models import Recipe, Region, Category, Comment, Festival, Ingredient
+from .paginator import EstimatedCountPaginator
+
+# Big tables: skip the extra unfiltered COUNT(*) and estimate the page count.
+# Search fields are backed by the trigram indexes from migration 0030.
 
 class FestivalAdmin(admin.ModelAdmin):
     list_display = ('name', 'date')
     search_fields = ('name',)
-    filter_horizontal = ('recipes',)  # For easy selection in ManyToMany
+    autocomplete_fields = ('recipes',)  # filter_horizontal rendered every recipe
+
 class IngredientInline(admin.TabularInline):
     model = Ingredient
     extra = 1
 
 class RecipeAdmin(admin.ModelAdmin):
     inlines = [IngredientInline]
+    list_display = ('title', 'category', 'region', 'created_by', 'created_at', 'comment_count')
+    list_select_related = ('category', 'region', 'created_by')
+    list_filter = ('category', 'region')
+    search_fields = ('title',)
+    autocomplete_fields = ('category', 'region', 'created_by')
+    raw_id_fields = ('likes', 'bookmarked_by')
+    readonly_fields = ('comment_count',)
+    ordering = ('-id',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
-admin.site.register(Ingredient)
-# admin.site.unregister(Recipe)
-admin.site.register(Recipe, RecipeAdmin)
-admin.site.register(Region)
-admin.site.register(Category)
-admin.site.register(Comment)
-admin.site.register(Festival)
+class IngredientAdmin(admin.ModelAdmin):
+    list_display = ('name', 'quantity', 'recipe')
+    list_select_related = ('recipe',)
+    search_fields = ('name',)
+    autocomplete_fields = ('recipe',)
+    ordering = ('-id',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+class CommentAdmin(admin.ModelAdmin):
+    list_display = ('user', 'recipe', 'short_text', 'created_at', 'reply_count')
+    list_select_related = ('user', 'recipe')
+    search_fields = ('=user__username', 'recipe__title')
+    autocomplete_fields = ('user', 'recipe')
+    raw_id_fields = ('parent',)
+    readonly_fields = ('reply_count',)
+    ordering = ('-id',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
+    @admin.display(description='Text')
+    def short_text(self, obj):
+        return obj.text[:60]
 
+class NameSearchAdmin(admin.ModelAdmin):
+    search_fields = ('name',)  # needed by the autocomplete widgets above
+    ordering = ('name',)
 
+admin.site.register(Ingredient, IngredientAdmin)
+# admin.site.unregister(Recipe)
+admin.site.register(Recipe, RecipeAdmin)
+admin.site.register(Region, NameSearchAdmin)
+admin.site.register(Category, NameSearchAdmin)
+admin.site.register(Comment, CommentAdmin)
+admin.site.register(Festival, FestivalAdmin)
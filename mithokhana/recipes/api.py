@@ -0,0 +1,192 @@
+import json
+
+from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.http import JsonResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import require_GET, require_POST
+
+from .autocomplete import suggest
+from .facets import search_recipes
+from .interactions import liked_ids, bookmarked_ids, following_ids, like_count_annotation
+from .models import Recipe
+
+# -------------------------------
+# JSON API for mobile clients
+# -------------------------------
+
+MAX_PAGE_SIZE = 50
+MAX_BATCH = 100
+AUTOCOMPLETE_MAX_AGE = 60
+
+# field name -> (columns for .only(), relations for select_related, serializer)
+CARD_FIELDS = {
+    'id': (['id'], [], lambda r: r.pk),
+    'title': (['title'], [], lambda r: r.title),
+    'description': (['description'], [], lambda r: r.description),
+    'category': (['category__name'], ['category'], lambda r: r.category.name if r.category else None),
+    'region': (['region__name'], ['region'], lambda r: r.region.name if r.region else None),
+    'image': (['image'], [], lambda r: r.image.url if r.image else None),
+    'video': (['video'], [], lambda r: r.video.url if r.video else None),
+    'created_by': (['created_by__username'], ['created_by'], lambda r: r.created_by.username),
+    'created_at': (['created_at'], [], lambda r: r.created_at.isoformat()),
+    'updated_at': (['updated_at'], [], lambda r: r.updated_at.isoformat()),
+    'cook_time': (['cook_time'], [], lambda r: r.cook_time),
+    'download_count': (['download_count'], [], lambda r: r.download_count),
+    'likes_count': ([], [], lambda r: r.likes_count),
+}
+DEFAULT_CARD_FIELDS = ['id', 'title', 'category', 'region', 'image', 'likes_count']
+
+BATCH_OPS = {
+    'like': ('liked_recipes', 'add'),
+    'unlike': ('liked_recipes', 'remove'),
+    'bookmark': ('bookmarked_recipes', 'add'),
+    'unbookmark': ('bookmarked_recipes', 'remove'),
+}
+
+
+def _int_param(request, name, default):
+    try:
+        return int(request.GET.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _is_id(value):
+    # str.isdigit() alone also accepts digits int() rejects, like '²'
+    value = str(value)
+    return value.isascii() and value.isdigit()
+
+
+def _id_list(value):
+    """Parse "1,2,3" into a de-duplicated list of ints, ignoring junk."""
+    ids = []
+    for part in (value or '').split(','):
+        part = part.strip()
+        if _is_id(part) and int(part) not in ids:
+            ids.append(int(part))
+    return ids
+
+
+@require_GET
+def recipe_cards(request):
+    """
+    A page of recipe cards.
+
+    ?fields=id,title,likes_count picks a sparse fieldset, ?page and
+    ?page_size page through the results, and q/category/region/festival
+    filter the same way recipe_list does.
+    """
+    fields = [f for f in request.GET.get('fields', '').split(',') if f] or DEFAULT_CARD_FIELDS
+    unknown = [f for f in fields if f not in CARD_FIELDS]
+    if unknown:
+        return JsonResponse({'error': 'Unknown fields: %s' % ', '.join(unknown)}, status=400)
+
+    page = max(_int_param(request, 'page', 1), 1)
+    page_size = min(max(_int_param(request, 'page_size', 20), 1), MAX_PAGE_SIZE)
+
+    only, related = {'id'}, set()
+    for f in fields:
+        only.update(CARD_FIELDS[f][0])
+        related.update(CARD_FIELDS[f][1])
+
+    filters = {'category': 'category__id', 'region': 'region__id', 'festival': 'festival_set__id'}
+    bad = [param for param in filters if request.GET.get(param) and not _is_id(request.GET[param])]
+    if bad:
+        return JsonResponse({'error': 'Invalid id for: %s' % ', '.join(bad)}, status=400)
+
+    recipes = search_recipes(Recipe.objects.all(), request.GET.get('q', '').strip())
+    for param, lookup in filters.items():
+        if request.GET.get(param):
+            recipes = recipes.filter(**{lookup: int(request.GET[param])})
+
+    recipes = recipes.select_related(*related).only(*only).order_by('-created_at', '-id')
+    if 'likes_count' in fields:
+        recipes = recipes.annotate(likes_count=like_count_annotation())
+
+    # Fetch one extra row instead of running COUNT(*) to know if there is more
+    offset = (page - 1) * page_size
+    rows = list(recipes[offset:offset + page_size + 1])
+
+    return JsonResponse({
+        'page': page,
+        'has_next': len(rows) > page_size,
+        'results': [{f: CARD_FIELDS[f][2](r) for f in fields} for r in rows[:page_size]],
+    })
+
+
+@require_GET
+@login_required
+def interaction_state(request):
+    """
+    Liked/bookmarked state for ?recipes=1,2,3 and following state for
+    ?users=4,5,6, answered from the cached per-user interaction sets.
+    """
+    recipe_ids = _id_list(request.GET.get('recipes'))[:MAX_BATCH]
+    user_ids = _id_list(request.GET.get('users'))[:MAX_BATCH]
+    user = request.user
+
+    liked, bookmarked, following = liked_ids(user), bookmarked_ids(user), following_ids(user)
+
+    return JsonResponse({
+        'recipes': {str(pk): {'liked': pk in liked, 'bookmarked': pk in bookmarked} for pk in recipe_ids},
+        'users': {str(pk): {'following': pk in following} for pk in user_ids},
+    })
+
+
+@require_POST
+@login_required
+def batch_interactions(request):
+    """
+    Apply many like/bookmark changes at once.
+
+    Body: {"ops": [{"op": "like", "recipe": 1}, {"op": "unbookmark", "recipe": 2}]}
+    Ops are grouped so each (relation, add/remove) pair costs one write.
+    """
+    try:
+        ops = json.loads(request.body or b'{}').get('ops', [])
+    except (ValueError, AttributeError):
+        return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+
+    if not isinstance(ops, list) or len(ops) > MAX_BATCH:
+        return JsonResponse({'error': 'ops must be a list of at most %d items' % MAX_BATCH}, status=400)
+
+    # Later ops on the same recipe and relation win
+    final = {}
+    for op in ops:
+        if not isinstance(op, dict) or op.get('op') not in BATCH_OPS or not _is_id(op.get('recipe', '')):
+            return JsonResponse({'error': 'Invalid op: %r' % (op,)}, status=400)
+        relation, action = BATCH_OPS[op['op']]
+        final[(relation, int(op['recipe']))] = action
+
+    all_ids = {pk for _, pk in final}
+    existing = set(Recipe.objects.filter(pk__in=all_ids).values_list('pk', flat=True))
+
+    grouped = {}
+    for (relation, pk), action in final.items():
+        if pk in existing:
+            grouped.setdefault((relation, action), []).append(pk)
+
+    user = request.user
+    with transaction.atomic():
+        for (relation, action), ids in grouped.items():
+            getattr(getattr(user, relation), action)(*ids)
+
+    liked, bookmarked = liked_ids(user), bookmarked_ids(user)
+    return JsonResponse({
+        'recipes': {str(pk): {'liked': pk in liked, 'bookmarked': pk in bookmarked} for pk in sorted(existing)},
+        'missing': sorted(all_ids - existing),
+    })
+
+
+@require_GET
+def autocomplete(request):
+    """
+    Search-box suggestions for ?q=, prefix and typo tolerant, across recipe
+    titles, ingredients, categories, regions and popular past searches.
+    """
+    q = request.GET.get('q', '').strip()[:100]
+    limit = max(_int_param(request, 'limit', 8), 1)
+    response = JsonResponse({'query': q, 'suggestions': suggest(q, limit) if q else []})
+    patch_cache_control(response, public=True, max_age=AUTOCOMPLETE_MAX_AGE)
+    return response
@@ -0,0 +1,37 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+# -------------------------------
+# Cached request.user
+# -------------------------------
+# AuthenticationMiddleware asks the session's backend for the user on every
+# request, and views then touch request.user.profile. This backend loads
+# both in one select_related query and keeps the pair in the cache;
+# signals.py forgets the entry whenever the User or Profile is saved or
+# deleted. The cache is shared by all workers (settings.CACHES), so the
+# eviction reaches every process. The session auth hash is still checked
+# by django.contrib.auth against the cached user, so a password change logs
+# other sessions out.
+
+AUTH_USER_CACHE_TIMEOUT = 60 * 15
+
+
+def _key(user_id):
+    return 'recipes:authuser:%s' % user_id
+
+
+def forget_cached_users(user_ids):
+    cache.delete_many([_key(user_id) for user_id in user_ids])
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        key = _key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = get_user_model()._default_manager.select_related('profile').filter(pk=user_id).first()
+            if user is None:
+                return None
+            cache.set(key, user, AUTH_USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,354 @@
+import bisect
+import math
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import F
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Recipe, Ingredient, Category, Region, SearchQuery
+from .pantry import ingredient_terms
+
+# -------------------------------
+# Search-box autocomplete
+# -------------------------------
+# Every process keeps its own in-memory index of recipe titles, ingredient
+# terms, categories, regions and popular past searches:
+#   - a sorted list of (form, key) pairs answers prefix lookups with bisect,
+#     where the forms are the label and each of its word suffixes with
+#     punctuation and spaces squeezed out ("mo:mo" -> "momo",
+#     "Sel Roti" -> "selroti", "roti");
+#   - a trigram -> (key, form) map answers fuzzy lookups for typos
+#     ("selrotti", "rotti").
+#
+# Saves bump AUTOCOMPLETE_VERSION_KEY and processes fold in the recipes
+# whose updated_at moved since their last sync. Deletes bump it too and
+# leave the deleted ids under a key named after the new version, so each
+# process drops exactly the recipes deleted since its own version.
+# AUTOCOMPLETE_EPOCH_KEY (bulk imports) and an index older than
+# INDEX_MAX_AGE, in case an update was lost, rebuild the index in a
+# background thread; requests keep using the old one meanwhile, and only
+# a process's very first lookup waits for a build.
+
+AUTOCOMPLETE_VERSION_KEY = 'recipes:autocomplete:version'
+AUTOCOMPLETE_EPOCH_KEY = 'recipes:autocomplete:epoch'
+AUTOCOMPLETE_DELETED_KEY = 'recipes:autocomplete:deleted:%s'
+DELETED_TIMEOUT = 60 * 60 * 24
+# A process further behind than this many versions rebuilds instead
+MAX_REPLAY = 1000
+
+INDEX_MAX_AGE = 60 * 30  # seconds
+POPULAR_QUERIES = 500
+POPULAR_REFRESH_SECONDS = 60 * 5
+# Allow for clock skew between the web process and the database
+SYNC_SLACK = timedelta(seconds=5)
+
+MIN_SIMILARITY = 0.35
+MAX_PREFIX_SCAN = 200
+MAX_LIMIT = 20
+
+RECIPE, INGREDIENT, CATEGORY, REGION, QUERY = 'recipe', 'ingredient', 'category', 'region', 'query'
+
+WORD_SPLIT_RE = re.compile(r'[\s\-/,()&]+')
+# Devanagari vowel signs are combining marks, not \w, so keep the whole block
+NON_FORM_RE = re.compile(r'[^\w\u0900-\u097f]|_')
+
+
+def compact(text):
+    """Lowercase and drop everything but letters, digits and Devanagari."""
+    return NON_FORM_RE.sub('', (text or '').lower())
+
+
+def trigrams(form):
+    padded = '  %s ' % form
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def normalize_query(query):
+    return ' '.join((query or '').lower().split())[:SearchQuery._meta.get_field('query').max_length]
+
+
+def _bump(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        value = int(time.time() * 1000)
+        cache.set(key, value, None)
+        return value
+
+
+def autocomplete_changed(deleted_recipe_ids=()):
+    version = _bump(AUTOCOMPLETE_VERSION_KEY)
+    if deleted_recipe_ids:
+        cache.set(AUTOCOMPLETE_DELETED_KEY % version, list(deleted_recipe_ids), DELETED_TIMEOUT)
+
+
+def autocomplete_reset():
+    _bump(AUTOCOMPLETE_EPOCH_KEY)
+
+
+class SuggestionIndex:
+    def __init__(self):
+        self.entries = {}               # key -> (label, weight)
+        self.forms = {}                 # key -> list of compact forms
+        self.prefixes = []              # sorted (form, key)
+        self.postings = defaultdict(set)  # trigram -> (key, form index)
+        self.gram_counts = {}           # (key, form index) -> number of trigrams of that form
+        self.recipe_terms = {}          # recipe id -> ingredient terms
+        self.term_counts = Counter()    # ingredient term -> number of recipes
+        self.popular = {}               # compact query -> search count
+        self.building = False           # append now, sort once in build()
+
+    @classmethod
+    def build(cls):
+        index = cls()
+        index.building = True
+        index.load_recipes()
+        index.load_labels()
+        index.load_popular()
+        index.prefixes.sort()
+        index.building = False
+        return index
+
+    # ---- maintenance ----
+
+    def add(self, key, label, weight=1):
+        self.remove(key)
+        label = label.strip()
+        words = [w for w in WORD_SPLIT_RE.split(label) if w]
+        forms = []
+        for i in range(len(words)):
+            form = compact(''.join(words[i:]))
+            if form and form not in forms:
+                forms.append(form)
+        if not forms:
+            return
+        self.entries[key] = (label, weight)
+        self.forms[key] = forms
+        for form in forms:
+            if self.building:
+                self.prefixes.append((form, key))
+            else:
+                bisect.insort(self.prefixes, (form, key))
+        for i, form in enumerate(forms):
+            grams = trigrams(form)
+            self.gram_counts[key, i] = len(grams)
+            for gram in grams:
+                self.postings[gram].add((key, i))
+
+    def remove(self, key):
+        if self.entries.pop(key, None) is None:
+            return
+        forms = self.forms.pop(key)
+        if self.building:
+            self.prefixes.sort()
+            self.building = False
+        for form in forms:
+            i = bisect.bisect_left(self.prefixes, (form, key))
+            if i < len(self.prefixes) and self.prefixes[i] == (form, key):
+                del self.prefixes[i]
+        for i, form in enumerate(forms):
+            del self.gram_counts[key, i]
+            for gram in trigrams(form):
+                self.postings[gram].discard((key, i))
+
+    def set_recipe(self, pk, title, terms):
+        self.add((RECIPE, pk), title)
+        old = self.recipe_terms.get(pk, set())
+        self.recipe_terms[pk] = terms
+        for term in old - terms:
+            self.term_counts[term] -= 1
+            if self.term_counts[term] <= 0:
+                del self.term_counts[term]
+                self.remove((INGREDIENT, term))
+        for term in terms - old:
+            self.term_counts[term] += 1
+        for term in old ^ terms:
+            if term in self.term_counts:
+                self.add((INGREDIENT, term), term, self.term_counts[term])
+
+    def drop_recipe(self, pk):
+        # An empty title removes the entry; no terms releases its ingredients
+        self.set_recipe(pk, '', set())
+        del self.recipe_terms[pk]
+
+    def load_recipes(self, recipe_ids=None):
+        recipes = Recipe.objects.order_by()
+        ingredients = Ingredient.objects.order_by()
+        if recipe_ids is not None:
+            recipes = recipes.filter(pk__in=recipe_ids)
+            ingredients = ingredients.filter(recipe_id__in=recipe_ids)
+
+        terms = defaultdict(set)
+        for recipe_id, name in ingredients.values_list('recipe_id', 'name').iterator():
+            terms[recipe_id] |= ingredient_terms(name)
+        for pk, title in recipes.values_list('pk', 'title').iterator():
+            self.set_recipe(pk, title, terms.get(pk, set()))
+
+    def load_labels(self):
+        # Small tables: reload them whole
+        for kind, model in ((CATEGORY, Category), (REGION, Region)):
+            for key in [k for k in self.entries if k[0] == kind]:
+                self.remove(key)
+            for pk, name in model.objects.values_list('pk', 'name'):
+                self.add((kind, pk), name)
+
+    def load_popular(self):
+        for key in [k for k in self.entries if k[0] == QUERY]:
+            self.remove(key)
+        rows = SearchQuery.objects.order_by('-count').values_list('query', 'count')[:POPULAR_QUERIES]
+        self.popular = {}
+        for query, count in rows:
+            self.add((QUERY, query), query, count)
+            self.popular[compact(query)] = count
+
+    # ---- lookup ----
+
+    def suggest(self, text, limit=8):
+        q = compact(text)
+        if not q:
+            return []
+
+        scores = {}
+        i = bisect.bisect_left(self.prefixes, (q,))
+        for form, key in self.prefixes[i:i + MAX_PREFIX_SCAN]:
+            if not form.startswith(q):
+                break
+            # Matching the start of the label beats matching a later word
+            match = 1.0 if form == self.forms[key][0] else 0.8
+            scores[key] = max(scores.get(key, 0), match)
+
+        if len(q) >= 3:
+            grams = trigrams(q)
+            shared = Counter()
+            for gram in grams:
+                shared.update(self.postings.get(gram, ()))
+            fuzzy = {}
+            for (key, i), n in shared.items():
+                similarity = n / (len(grams) + self.gram_counts[key, i] - n)
+                fuzzy[key] = max(fuzzy.get(key, 0), similarity)
+            for key, similarity in fuzzy.items():
+                if similarity >= MIN_SIMILARITY and key not in scores:
+                    scores[key] = 0.7 * similarity
+
+        ranked = []
+        for key, score in scores.items():
+            label, weight = self.entries[key]
+            # Popular entries and things people actually searched for float up
+            score += 0.05 * math.log1p(weight) + 0.1 * math.log1p(self.popular.get(self.forms[key][0], 0))
+            ranked.append((-score, label.lower(), key))
+        ranked.sort()
+
+        results, seen = [], set()
+        for _, _, key in ranked:
+            label = self.entries[key][0]
+            if (key[0], label.lower()) in seen:
+                continue
+            seen.add((key[0], label.lower()))
+            results.append({'label': label, 'kind': key[0], 'url': suggestion_url(key)})
+            if len(results) >= limit:
+                break
+        return results
+
+
+def suggestion_url(key):
+    kind, ident = key
+    if kind == RECIPE:
+        return reverse('recipe_detail', args=[ident])
+    params = {INGREDIENT: 'have', CATEGORY: 'category', REGION: 'region', QUERY: 'q'}[kind]
+    return '%s?%s' % (reverse('recipe_list'), urlencode({params: ident}))
+
+# -------------------------------
+# Per-process index and refresh
+# -------------------------------
+
+_lock = threading.Lock()
+_state = {
+    'index': None, 'epoch': None, 'version': None, 'synced_at': None,
+    'built_at': 0, 'popular_at': 0, 'rebuilding': False,
+}
+
+
+def get_index():
+    epoch = cache.get(AUTOCOMPLETE_EPOCH_KEY)
+    version = cache.get(AUTOCOMPLETE_VERSION_KEY)
+    with _lock:
+        if _state['index'] is None:
+            _state.update(
+                index=SuggestionIndex.build(), epoch=epoch, version=version, synced_at=timezone.now(),
+                built_at=time.monotonic(), popular_at=time.monotonic(),
+            )
+        index = _state['index']
+        if epoch != _state['epoch'] or time.monotonic() - _state['built_at'] > INDEX_MAX_AGE:
+            _rebuild_in_background(epoch)
+        if version != _state['version']:
+            _sync(index, _state['version'], version)
+        if time.monotonic() - _state['popular_at'] > POPULAR_REFRESH_SECONDS:
+            index.load_popular()
+            _state['popular_at'] = time.monotonic()
+    return index
+
+
+def _sync(index, old_version, new_version):
+    """Fold in what changed between two versions; called with _lock held."""
+    now = timezone.now()
+    changed = Recipe.objects.filter(updated_at__gte=_state['synced_at'] - SYNC_SLACK)
+    index.load_recipes(list(changed.values_list('pk', flat=True)))
+    index.load_labels()
+
+    if isinstance(old_version, int) and isinstance(new_version, int) and 0 < new_version - old_version <= MAX_REPLAY:
+        keys = [AUTOCOMPLETE_DELETED_KEY % v for v in range(old_version + 1, new_version + 1)]
+        for recipe_ids in cache.get_many(keys).values():
+            for pk in recipe_ids:
+                index.drop_recipe(pk)
+    else:
+        # Too far behind (or the stamp was evicted) to know what was deleted
+        _rebuild_in_background(_state['epoch'])
+    _state.update(version=new_version, synced_at=now)
+
+
+def _rebuild_in_background(epoch):
+    if not _state['rebuilding']:
+        _state['rebuilding'] = True
+        threading.Thread(target=_rebuild, args=(epoch,), daemon=True).start()
+
+
+def _rebuild(epoch):
+    try:
+        started = timezone.now()
+        version = cache.get(AUTOCOMPLETE_VERSION_KEY)
+        index = SuggestionIndex.build()
+        with _lock:
+            # Changes made during the build are replayed by the next get_index()
+            _state.update(
+                index=index, epoch=epoch, version=version, synced_at=started,
+                built_at=time.monotonic(), popular_at=time.monotonic(),
+            )
+    finally:
+        with _lock:
+            _state['rebuilding'] = False
+        # Connections are per thread; don't leave this one open
+        connections.close_all()
+
+
+def suggest(text, limit=8):
+    index = get_index()
+    with _lock:
+        return index.suggest(text, min(limit, MAX_LIMIT))
+
+
+def record_search(query):
+    """Count a search that found something; these become ranked suggestions."""
+    query = normalize_query(query)
+    if not query:
+        return
+    obj, created = SearchQuery.objects.get_or_create(query=query)
+    if not created:
+        SearchQuery.objects.filter(pk=obj.pk).update(count=F('count') + 1, last_searched=timezone.now())
@@ -0,0 +1,64 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+from .models import Comment
+
+# -------------------------------
+# Cursor pagination for comment threads
+# -------------------------------
+# Top-level comments are listed newest first and replies oldest first. A
+# cursor is the (created_at, id) of the last comment on the previous page,
+# so pages stay stable while new comments arrive and never need an OFFSET.
+
+COMMENTS_PAGE_SIZE = 10
+REPLIES_PAGE_SIZE = 10
+
+
+def encode_cursor(comment):
+    raw = '%s|%s' % (comment.created_at.isoformat(), comment.pk)
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Return (created_at, id); raises ValueError on a malformed cursor."""
+    try:
+        created_at, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(created_at), int(pk)
+    except (TypeError, ValueError) as e:
+        raise ValueError('Invalid cursor') from e
+
+
+def _page(comments, cursor, size, newest_first):
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        if newest_first:
+            comments = comments.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+        else:
+            comments = comments.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk))
+
+    order = ('-created_at', '-id') if newest_first else ('created_at', 'id')
+    rows = list(comments.select_related('user').order_by(*order)[:size + 1])
+    next_cursor = encode_cursor(rows[size - 1]) if len(rows) > size else None
+    return rows[:size], next_cursor
+
+
+def top_level_page(recipe, cursor=None, size=COMMENTS_PAGE_SIZE):
+    return _page(Comment.objects.filter(recipe=recipe, parent=None), cursor, size, newest_first=True)
+
+
+def replies_page(comment, cursor=None, size=REPLIES_PAGE_SIZE):
+    return _page(Comment.objects.filter(parent=comment), cursor, size, newest_first=False)
+
+
+def serialize_comment(comment, user):
+    return {
+        'id': comment.id,
+        'username': comment.user.username,
+        'text': comment.text,
+        'created_at': comment.created_at.strftime('%Y-%m-%d %H:%M'),
+        'parent_id': comment.parent_id,
+        'reply_count': comment.reply_count,
+        'can_delete': comment.user_id == user.pk,
+    }
@@ -0,0 +1,70 @@
+import hashlib
+
+from django.contrib import messages
+from django.utils.translation import get_language
+
+from .models import Recipe, Profile
+
+# -------------------------------
+# Conditional GET validators
+# -------------------------------
+# Each page gets a single indexed lookup for its newest updated_at stamp,
+# memoized on the request so the ETag and Last-Modified functions share it.
+# Pages are rendered per viewer and per language, so both go into the ETag.
+
+def _memo(request, key, compute):
+    cache = request.__dict__.setdefault('_conditional_stamps', {})
+    if key not in cache:
+        stamp = compute()
+        # Pending flash messages must be rendered, never answered with a 304
+        cache[key] = None if stamp is None or messages.get_messages(request) else stamp
+    return cache[key]
+
+
+def _etag(request, stamp):
+    if stamp is None:
+        return None
+    raw = '%s:%s:%s' % (stamp.isoformat(), request.user.pk or 0, get_language())
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def recipe_stamp(request, pk):
+    def compute():
+        # The detail page also shows the author's chef badge
+        row = Recipe.objects.filter(pk=pk).values_list('updated_at', 'created_by__profile__updated_at').first()
+        return max(filter(None, row)) if row else None
+    return _memo(request, ('recipe', pk), compute)
+
+
+def recipe_etag(request, pk):
+    return _etag(request, recipe_stamp(request, pk))
+
+
+def own_profile_stamp(request):
+    def compute():
+        return Profile.objects.filter(user_id=request.user.pk).values_list('updated_at', flat=True).first()
+    return _memo(request, ('own_profile',), compute)
+
+
+def own_profile_etag(request):
+    return _etag(request, own_profile_stamp(request))
+
+
+def profile_stamp(request, username):
+    def compute():
+        return Profile.objects.filter(user__username=username).values_list('updated_at', flat=True).first()
+    return _memo(request, ('profile', username), compute)
+
+
+def profile_etag(request, username):
+    return _etag(request, profile_stamp(request, username))
+
+
+def user_profile_stamp(request, user_id):
+    def compute():
+        return Profile.objects.filter(user_id=user_id).values_list('updated_at', flat=True).first()
+    return _memo(request, ('user_profile', user_id), compute)
+
+
+def user_profile_etag(request, user_id):
+    return _etag(request, user_profile_stamp(request, user_id))
@@ -0,0 +1,60 @@
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .auth import forget_cached_users
+from .models import Recipe, Comment, Profile
+from .profiles import forget_profile_stats
+
+# -------------------------------
+# Denormalized counter repair
+# -------------------------------
+# signals.py keeps the counters in step with F() updates, but raw SQL,
+# bulk deletes and crashes between two writes can still make them drift.
+# recount_counters() walks each table in primary-key batches and rewrites
+# only the rows whose stored value differs from a fresh COUNT.
+
+
+def _count(queryset, field, outer='pk'):
+    counts = queryset.filter(**{field: OuterRef(outer)}).order_by().values(field).annotate(n=Count('*')).values('n')
+    return Coalesce(Subquery(counts), Value(0))
+
+
+def _follows():
+    return Profile.followers.through.objects.all()
+
+
+# (model, counter field, expression counting the real rows for each row)
+COUNTERS = [
+    (Profile, 'follower_count', lambda: _count(_follows(), 'profile_id')),
+    (Profile, 'following_count', lambda: _count(_follows(), 'user_id', outer='user_id')),
+    (Recipe, 'comment_count', lambda: _count(Comment.objects.all(), 'recipe_id')),
+    (Comment, 'reply_count', lambda: _count(Comment.objects.all(), 'parent_id')),
+]
+
+
+def recount_counters(batch_size=1000):
+    """Repair drifted counters; returns {'Model.field': rows fixed}."""
+    fixed = {}
+    for model, field, actual in COUNTERS:
+        label = '%s.%s' % (model.__name__, field)
+        fixed[label] = 0
+        last_pk = 0
+        while True:
+            pks = list(
+                model.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not pks:
+                break
+            last_pk = pks[-1]
+            drifted = list(
+                model.objects.filter(pk__in=pks).annotate(actual=actual())
+                .exclude(**{field: F('actual')}).values_list('pk', flat=True)
+            )
+            if drifted:
+                # Recounted inside the UPDATE, so a concurrent F() update cannot be lost
+                fixed[label] += model.objects.filter(pk__in=drifted).update(**{field: actual()})
+                if model is Profile:
+                    user_ids = list(Profile.objects.filter(pk__in=drifted).values_list('user_id', flat=True))
+                    forget_cached_users(user_ids)
+                    forget_profile_stats(user_ids)
+    return fixed
@@ -0,0 +1,90 @@
+import hashlib
+import time
+from collections import Counter
+
+from django.core.cache import cache
+from django.db.models import Count, OuterRef, Q, Subquery
+
+from .models import Recipe, Festival
+
+# -------------------------------
+# Facet counts for the recipe list filters
+# -------------------------------
+
+FACET_CACHE_TIMEOUT = 60 * 5
+FACET_VERSION_KEY = 'recipes:facets:version'
+
+
+def facet_version():
+    # Start from a timestamp so an evicted version never collides with old keys
+    return cache.get_or_set(FACET_VERSION_KEY, int(time.time() * 1000), None)
+
+
+def bump_facet_version():
+    try:
+        cache.incr(FACET_VERSION_KEY)
+    except ValueError:
+        cache.set(FACET_VERSION_KEY, int(time.time() * 1000), None)
+
+
+def search_recipes(recipes, query):
+    if query:
+        recipes = recipes.filter(Q(title__icontains=query) | Q(description__icontains=query))
+    return recipes
+
+
+def facet_counts(query='', category_id='', region_id='', festival_id=''):
+    """
+    Return {'categories': {id: n}, 'regions': {id: n}, 'festivals': {id: n}}.
+
+    Each facet counts the recipes matching the search and the *other*
+    selected filters, so picking an option never leads to an empty page.
+    """
+    raw = repr((query.lower(), str(category_id), str(region_id), str(festival_id)))
+    key = 'recipes:facets:%s:%s' % (facet_version(), hashlib.md5(raw.encode()).hexdigest())
+
+    counts = cache.get(key)
+    if counts is None:
+        counts = _compute_facets(query, str(category_id), str(region_id), str(festival_id))
+        cache.set(key, counts, FACET_CACHE_TIMEOUT)
+    return counts
+
+
+def _compute_facets(query, category_id, region_id, festival_id):
+    # One grouped query over (category, region, festival). A recipe with
+    # several festivals shows up in several groups, so `anchored` only counts
+    # the row of its lowest festival id to get distinct recipe totals.
+    first_festival = Festival.objects.filter(recipes=OuterRef('pk')).order_by('pk').values('pk')[:1]
+    rows = (
+        search_recipes(Recipe.objects.all(), query)
+        .values('category_id', 'region_id', 'festival_set__id')
+        .annotate(
+            pairs=Count('id'),
+            anchored=Count('id', filter=Q(festival_set__isnull=True) | Q(festival_set__id=Subquery(first_festival))),
+        )
+        .order_by()
+    )
+
+    categories, regions, festivals = Counter(), Counter(), Counter()
+    for row in rows:
+        cat, reg, fest = row['category_id'], row['region_id'], row['festival_set__id']
+        cat_ok = not category_id or str(cat) == category_id
+        reg_ok = not region_id or str(reg) == region_id
+
+        if festival_id:
+            n = row['pairs'] if str(fest) == festival_id else 0
+        else:
+            n = row['anchored']
+
+        if n and reg_ok and cat is not None:
+            categories[cat] += n
+        if n and cat_ok and reg is not None:
+            regions[reg] += n
+        if fest is not None and cat_ok and reg_ok:
+            festivals[fest] += row['pairs']
+
+    return {
+        'categories': dict(categories),
+        'regions': dict(regions),
+        'festivals': dict(festivals),
+    }
@@ -0,0 +1,52 @@
+from .interactions import following_ids
+from .models import Profile
+
+# -------------------------------
+# Cursor pagination for follower / following lists
+# -------------------------------
+# Pages walk the follow table itself, newest follow first, with the link's
+# id as the cursor; one query per page brings each user along with their
+# profile (and photo). The "you follow them" marker is the intersection of
+# the page's user ids with the viewer's cached following set.
+
+FOLLOWS_PAGE_SIZE = 20
+
+Follow = Profile.followers.through
+
+
+def decode_cursor(cursor):
+    """The follow-link id to continue below, or None to start from the top;
+    raises ValueError on a malformed cursor."""
+    if not cursor:
+        return None
+    try:
+        return int(cursor)
+    except ValueError as e:
+        raise ValueError('Invalid cursor') from e
+
+
+def _page(links, cursor, size, user_of):
+    before = decode_cursor(cursor)
+    if before is not None:
+        links = links.filter(pk__lt=before)
+    rows = list(links.order_by('-pk')[:size + 1])
+    next_cursor = str(rows[size - 1].pk) if len(rows) > size else None
+    return [user_of(link) for link in rows[:size]], next_cursor
+
+
+def followers_page(profile, cursor=None, size=FOLLOWS_PAGE_SIZE):
+    links = Follow.objects.filter(profile_id=profile.pk).select_related('user__profile')
+    return _page(links, cursor, size, lambda link: link.user)
+
+
+def following_page(user, cursor=None, size=FOLLOWS_PAGE_SIZE):
+    links = Follow.objects.filter(user_id=user.pk).select_related('profile__user')
+    return _page(links, cursor, size, lambda link: link.profile.user)
+
+
+def mark_followed(users, viewer):
+    """Set user.viewer_follows on each user of a page; no query per row."""
+    followed = following_ids(viewer) & {user.pk for user in users}
+    for user in users:
+        user.viewer_follows = user.pk in followed
+    return users
@@ -1,6 +1,7 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from .models import Recipe, Profile
+from .images import prepare_image
 from django.contrib.auth.models import User
 
 from django.core.exceptions import ValidationError
@@ -19,14 +20,22 @@ class UserRegisterForm(UserCreationForm):
         model = User
         fields = ['username', 'email', 'password1', 'password2']
 
-class ProfileForm(forms.ModelForm):
+class PhotoUploadMixin:
+    def clean_photo(self):
+        photo = self.cleaned_data.get('photo')
+        # Only new uploads; an unchanged photo is the already stored FieldFile
+        if photo and hasattr(photo, 'content_type'):
+            photo = prepare_image(photo)
+        return photo
+
+class ProfileForm(PhotoUploadMixin, forms.ModelForm):
     is_chef = forms.BooleanField(required=False, label="I am a Chef")
 
     class Meta:
         model = Profile
         fields = ['bio', 'photo', 'is_chef', 'experience', 'specialty']
         
-class EditProfileForm(forms.ModelForm):
+class EditProfileForm(PhotoUploadMixin, forms.ModelForm):
     fullname = forms.CharField(max_length=100, required=False)
     is_chef = forms.BooleanField(required=False, label="I am a Chef")
 
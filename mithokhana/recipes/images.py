@@ -0,0 +1,120 @@
+import os
+import tempfile
+
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# -------------------------------
+# Image upload validation and downscaling
+# -------------------------------
+# The upload's content_type and extension come from the client, so the
+# format is sniffed from the first bytes and confirmed by Pillow reading
+# the header only (no pixel decode). Big or metadata-carrying images are
+# re-encoded: JPEGs are decoded at reduced scale with draft(), so a 48 MP
+# phone photo never becomes a full-size bitmap in memory, and the result
+# is spooled to disk past a few MB.
+
+MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+# Longest side kept; recipe cards and the PDF never show more
+MAX_DIMENSION = 2048
+# Originals up to this size with no metadata are stored untouched
+MAX_STORED_BYTES = 1024 * 1024
+JPEG_QUALITY = 85
+
+# JPEG decodes through draft(), so only the header size is limited; other
+# formats are decoded in full before resizing
+MAX_PIXELS = 100_000_000
+MAX_FULL_DECODE_PIXELS = 25_000_000
+
+SIGNATURES = [
+    (b'\xff\xd8\xff', 'JPEG'),
+    (b'\x89PNG\r\n\x1a\n', 'PNG'),
+    (b'GIF87a', 'GIF'),
+    (b'GIF89a', 'GIF'),
+]
+EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'GIF': '.gif', 'WEBP': '.webp'}
+# Personal data (EXIF GPS, XMP, comments) that is stripped on re-encode
+METADATA_KEYS = ('exif', 'xmp', 'XML:com.adobe.xmp', 'comment')
+
+
+def sniff_image_format(f):
+    """The image format from the file's magic bytes, or None."""
+    f.seek(0)
+    head = f.read(12)
+    f.seek(0)
+    for signature, fmt in SIGNATURES:
+        if head.startswith(signature):
+            return fmt
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'WEBP'
+    return None
+
+
+def prepare_image(upload):
+    """
+    Validate an uploaded image and return what should be stored: the upload
+    itself when it is small and clean, otherwise a downscaled, metadata-free
+    re-encode. Raises ValidationError for anything that is not a usable image.
+    """
+    if upload.size > MAX_UPLOAD_BYTES:
+        raise ValidationError("Image is too large (max %d MB)." % (MAX_UPLOAD_BYTES // (1024 * 1024)))
+
+    fmt = sniff_image_format(upload)
+    if fmt is None:
+        raise ValidationError("Invalid image format. Please upload JPEG, PNG, GIF or WebP only.")
+
+    try:
+        img = Image.open(upload)  # reads the header only
+        width, height = img.size
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        raise ValidationError("The image file is damaged or unreadable.")
+    limit = MAX_PIXELS if fmt == 'JPEG' else MAX_FULL_DECODE_PIXELS
+    if img.format != fmt or width * height > limit:
+        raise ValidationError("The image dimensions are too large.")
+
+    stem = os.path.splitext(os.path.basename(upload.name or 'image'))[0] or 'image'
+    name = stem + EXTENSIONS[fmt]
+    oversized = max(width, height) > MAX_DIMENSION or upload.size > MAX_STORED_BYTES
+    has_metadata = any(key in img.info for key in METADATA_KEYS)
+
+    if fmt == 'GIF':
+        # Animated GIFs would lose their frames, so they are only size-checked
+        if oversized:
+            raise ValidationError("GIF images must be under %d px and 1 MB." % MAX_DIMENSION)
+        upload.seek(0)
+        upload.name = name
+        return upload
+
+    if not oversized and not has_metadata:
+        upload.seek(0)
+        upload.name = name
+        return upload
+
+    try:
+        return _reencode(img, fmt, name)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        raise ValidationError("The image file is damaged or unreadable.")
+
+
+def _reencode(img, fmt, name):
+    icc_profile = img.info.get('icc_profile')
+    if fmt == 'JPEG':
+        # Let libjpeg scale down by 1/2, 1/4 or 1/8 while decoding
+        img.draft('RGB', (MAX_DIMENSION, MAX_DIMENSION))
+    # Bake the EXIF orientation into the pixels before the EXIF is dropped
+    img = ImageOps.exif_transpose(img)
+    img.thumbnail((MAX_DIMENSION, MAX_DIMENSION), Image.LANCZOS, reducing_gap=3.0)
+
+    out = tempfile.SpooledTemporaryFile(max_size=4 * MAX_STORED_BYTES)
+    options = {'icc_profile': icc_profile} if icc_profile else {}
+    if fmt == 'JPEG':
+        if img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        img.save(out, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True, **options)
+    elif fmt == 'WEBP':
+        img.save(out, 'WEBP', quality=JPEG_QUALITY, **options)
+    else:
+        img.save(out, 'PNG', optimize=True, **options)
+    out.seek(0)
+    return File(out, name=name)
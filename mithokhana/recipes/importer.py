@@ -0,0 +1,270 @@
+import csv
+import hashlib
+import io
+import json
+
+from django.contrib.auth.models import User
+from django.db import DatabaseError, connection, transaction
+
+from .autocomplete import autocomplete_reset
+from .facets import bump_facet_version
+from .models import Recipe, Ingredient, Category, Region, Festival
+from .pagecache import bump_page_version
+from .pantry import rebuild_index
+from .signals import touch_profiles
+
+# -------------------------------
+# Bulk recipe import
+# -------------------------------
+# Reads the same shape export.py writes (JSON Lines, or CSV with
+# `ingredients`/`festivals` as a JSON list or "; "-separated text) and
+# inserts a batch at a time: one transaction per batch, recipes via
+# bulk_create, ingredients via COPY on PostgreSQL (bulk_create elsewhere).
+# Category/region/festival/author names are resolved once up front.
+#
+# Every recipe gets an import_key (<source>:<id>, or a content hash when
+# the row has no id); keys already in the table are skipped, so a failed
+# or interrupted import can simply be run again. Bad rows are reported by
+# line number and left out, never allowed to fail the batch: fields are
+# type- and range-checked up front, and a batch the database still
+# refuses is retried row by row.
+
+IMPORT_BATCH_SIZE = 500
+INGREDIENT_COLUMNS = ('recipe_id', 'name', 'quantity', 'cook_time', 'note')
+
+
+class ImportRowError(ValueError):
+    pass
+
+
+def read_rows(f, fmt):
+    """Yield (line number, dict) from a JSONL or CSV text stream."""
+    if fmt == 'jsonl':
+        for number, line in enumerate(f, start=1):
+            if line.strip():
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    row = ImportRowError(f"invalid JSON: {e}")
+                if not isinstance(row, (dict, ImportRowError)):
+                    row = ImportRowError("expected a JSON object")
+                yield number, row
+    else:
+        reader = csv.DictReader(f)
+        for row in reader:
+            yield reader.line_num, row
+
+
+def _text(value, field):
+    """A field as stripped text; numbers are taken as written, anything else is rejected."""
+    if value is None:
+        return ''
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        value = str(value)
+    if not isinstance(value, str):
+        raise ImportRowError(f"{field} must be text")
+    return value.strip()
+
+
+def _cook_time(value):
+    if value in (None, ''):
+        return 0
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    try:
+        if isinstance(value, bool) or not isinstance(value, (int, str)):
+            raise ValueError
+        minutes = int(value)
+    except ValueError:
+        raise ImportRowError(f"cook_time must be a whole number of minutes, not {value!r}")
+    low, high = connection.ops.integer_field_range('PositiveIntegerField')
+    if not low <= minutes <= high:
+        raise ImportRowError(f"cook_time out of range: {minutes}")
+    return minutes
+
+
+def _list(value, field):
+    if value in (None, ''):
+        return []
+    if isinstance(value, list):
+        return value
+    value = _text(value, field)
+    if value.startswith('['):
+        return json.loads(value)
+    return [part.strip() for part in value.split(';') if part.strip()]
+
+
+def _ingredient(value):
+    if isinstance(value, dict):
+        return {field: _text(value.get(field), field) for field in INGREDIENT_COLUMNS[1:]}
+    # Plain text (CSV) keeps the whole "1 tsp salt" as the name
+    return {'name': _text(value, 'ingredient'), 'quantity': '', 'cook_time': '', 'note': ''}
+
+
+def _import_key(source, row):
+    if row.get('id') not in (None, ''):
+        return f"{source}:{row['id']}"[:100]
+    digest = hashlib.sha1(json.dumps(
+        [row.get('title'), row.get('author'), row.get('description')], sort_keys=True, default=str
+    ).encode()).hexdigest()
+    return f"{source}:sha1:{digest}"[:100]
+
+
+class Lookups:
+    """Name -> id maps loaded once; missing categories/regions/festivals are created on first use."""
+    def __init__(self, default_author=None, create_missing=True):
+        self.create_missing = create_missing
+        self.ids = {
+            Category: dict(Category.objects.values_list('name', 'id')),
+            Region: dict(Region.objects.values_list('name', 'id')),
+            Festival: dict(Festival.objects.values_list('name', 'id')),
+        }
+        self.users = {}
+        self.default_author = default_author
+
+    def named(self, model, name):
+        label = model.__name__.lower()
+        name = _text(name, label)
+        if not name:
+            return None
+        if len(name) > model._meta.get_field('name').max_length:
+            raise ImportRowError(f"{label} name too long: {name[:40]!r}...")
+        ids = self.ids[model]
+        if name not in ids:
+            if not self.create_missing:
+                raise ImportRowError(f"unknown {label} {name!r}")
+            ids[name] = model.objects.get_or_create(name=name)[0].pk
+        return ids[name]
+
+    def author(self, username):
+        """The row's author, or the default author when the row names none or an unknown user."""
+        username = _text(username, 'author')
+        user_id = self.user_id_for(username) if username else None
+        if user_id is None and self.default_author:
+            user_id = self.user_id_for(self.default_author)
+        if user_id is None:
+            raise ImportRowError(f"unknown author {username!r}" if username else "no author given")
+        return user_id
+
+    def user_id_for(self, username):
+        if username not in self.users:
+            self.users[username] = User.objects.filter(username=username).values_list('id', flat=True).first()
+        return self.users[username]
+
+
+def _copy_value(value):
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def _insert_ingredients(rows):
+    """rows: tuples in INGREDIENT_COLUMNS order."""
+    if connection.vendor == 'postgresql' and rows:
+        table = connection.ops.quote_name(Ingredient._meta.db_table)
+        sql = 'COPY %s (%s) FROM STDIN' % (table, ', '.join(INGREDIENT_COLUMNS))
+        with connection.cursor() as cursor:
+            if hasattr(cursor, 'copy'):  # psycopg 3
+                with cursor.copy(sql) as copy:
+                    for row in rows:
+                        copy.write_row(row)
+                return
+            if hasattr(cursor.cursor, 'copy_expert'):  # psycopg2
+                data = ''.join('\t'.join(_copy_value(v) for v in row) + '\n' for row in rows)
+                cursor.cursor.copy_expert(sql, io.StringIO(data))
+                return
+    Ingredient.objects.bulk_create([Ingredient(**dict(zip(INGREDIENT_COLUMNS, row))) for row in rows], batch_size=1000)
+
+
+def _insert_batch(batch):
+    """batch: list of (import_key, Recipe, ingredients, festival ids); returns how many were new."""
+    keys = [key for key, *_ in batch]
+    with transaction.atomic():
+        seen = set(Recipe.objects.filter(import_key__in=keys).values_list('import_key', flat=True))
+        new = []
+        for item in batch:
+            # Already imported (an earlier run) or repeated within the file
+            if item[0] not in seen:
+                seen.add(item[0])
+                new.append(item)
+        batch = new
+        if not batch:
+            return 0
+        recipes = Recipe.objects.bulk_create([recipe for _, recipe, _, _ in batch])
+
+        ingredients, festival_links = [], []
+        FestivalRecipe = Festival.recipes.through
+        for (_, _, items, festival_ids), recipe in zip(batch, recipes):
+            ingredients.extend((recipe.pk, i['name'][:100], i['quantity'][:100], i['cook_time'][:50], i['note'][:150]) for i in items)
+            festival_links.extend(FestivalRecipe(festival_id=f, recipe_id=recipe.pk) for f in festival_ids)
+        _insert_ingredients(ingredients)
+        FestivalRecipe.objects.bulk_create(festival_links, ignore_conflicts=True)
+        # Nothing above sends signals, so index the ingredients here
+        rebuild_index([recipe.pk for recipe in recipes])
+    return len(recipes)
+
+
+def import_recipes(rows, source, lookups, batch_size=IMPORT_BATCH_SIZE, progress=None):
+    """
+    Import (line number, row) pairs. Returns (created, skipped, errors) where
+    errors is a list of (line number, message) for rows that were left out.
+    """
+    created = skipped = 0
+    errors, batch, lines, authors = [], [], [], set()
+
+    def flush():
+        nonlocal created, skipped
+        try:
+            new, refused = _insert_batch(batch), 0
+        except DatabaseError:
+            # Something the checks above let through; find the row(s) and keep the rest
+            new = refused = 0
+            for number, item in zip(lines, batch):
+                item[1].pk = None  # set by the rolled-back insert
+                try:
+                    new += _insert_batch([item])
+                except DatabaseError as e:
+                    errors.append((number, "rejected by the database: %s" % str(e).strip().split("\n")[0]))
+                    refused += 1
+        created += new
+        skipped += len(batch) - new - refused
+        batch.clear()
+        lines.clear()
+        if progress:
+            progress(created, skipped, len(errors))
+
+    for number, row in rows:
+        try:
+            if isinstance(row, Exception):
+                raise row
+            title = _text(row.get('title'), 'title')
+            if not title:
+                raise ImportRowError("missing title")
+            author_id = lookups.author(row.get('author'))
+            recipe = Recipe(
+                title=title[:200],
+                description=_text(row.get('description'), 'description'),
+                category_id=lookups.named(Category, row.get('category')),
+                region_id=lookups.named(Region, row.get('region')),
+                created_by_id=author_id,
+                cook_time=_cook_time(row.get('cook_time')),
+                import_key=_import_key(source, row),
+            )
+            ingredients = [_ingredient(i) for i in _list(row.get('ingredients'), 'ingredients')]
+            festival_ids = {lookups.named(Festival, name) for name in _list(row.get('festivals'), 'festivals')} - {None}
+        except (ImportRowError, ValueError, TypeError) as e:
+            errors.append((number, str(e)))
+            continue
+        authors.add(author_id)
+        batch.append((recipe.import_key, recipe, [i for i in ingredients if i['name']], festival_ids))
+        lines.append(number)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    if created:
+        # Once for the whole import instead of per row
+        bump_facet_version()
+        autocomplete_reset()
+        bump_page_version()
+        touch_profiles(user_ids=authors)
+    return created, skipped, errors
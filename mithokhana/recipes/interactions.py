@@ -0,0 +1,70 @@
+from django.core.cache import cache
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Recipe, Profile
+
+# -------------------------------
+# Per-user interaction sets
+# -------------------------------
+# Compact id sets answering "has this user liked / bookmarked / followed X?"
+# without touching the M2M tables. Filled lazily on first use; the
+# m2m_changed handlers in signals.py drop a user's set once a change to it
+# commits.
+
+INTERACTION_CACHE_TIMEOUT = 60 * 60
+
+LIKED = 'liked'
+BOOKMARKED = 'bookmarked'
+FOLLOWING = 'following'
+
+_LOADERS = {
+    LIKED: lambda user_id: Recipe.likes.through.objects.filter(user_id=user_id).values_list('recipe_id', flat=True),
+    BOOKMARKED: lambda user_id: Recipe.bookmarked_by.through.objects.filter(user_id=user_id).values_list('recipe_id', flat=True),
+    # Stored as the followed *user* ids, which is what views and templates have at hand
+    FOLLOWING: lambda user_id: Profile.objects.filter(followers=user_id).values_list('user_id', flat=True),
+}
+
+
+def _key(kind, user_id):
+    return 'recipes:user:%s:%s' % (user_id, kind)
+
+
+def interaction_ids(user, kind):
+    if not user.is_authenticated:
+        return frozenset()
+    key = _key(kind, user.pk)
+    ids = cache.get(key)
+    if ids is None:
+        ids = frozenset(_LOADERS[kind](user.pk))
+        cache.set(key, ids, INTERACTION_CACHE_TIMEOUT)
+    return ids
+
+
+def liked_ids(user):
+    return interaction_ids(user, LIKED)
+
+
+def bookmarked_ids(user):
+    return interaction_ids(user, BOOKMARKED)
+
+
+def following_ids(user):
+    return interaction_ids(user, FOLLOWING)
+
+
+def forget_interaction_ids(kind, user_ids):
+    cache.delete_many([_key(kind, user_id) for user_id in user_ids])
+
+
+def like_count_annotation():
+    """
+    Per-recipe like count as a correlated subquery. Unlike Count('likes') it
+    needs no GROUP BY, so ORDER BY created_at LIMIT n can walk an index and
+    only count likes for the rows on the page.
+    """
+    likes = (
+        Recipe.likes.through.objects.filter(recipe_id=OuterRef('pk'))
+        .order_by().values('recipe_id').annotate(n=Count('*')).values('n')
+    )
+    return Coalesce(Subquery(likes), Value(0))
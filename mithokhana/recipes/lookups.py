@@ -0,0 +1,94 @@
+import threading
+import time
+
+from django.core.cache import cache
+
+from .models import Category, Region, Festival
+
+# -------------------------------
+# In-process reference tables
+# -------------------------------
+# Category, Region and Festival change a few times a year but fill every
+# filter bar and upload form. Each process keeps the full rows in memory
+# for LOOKUP_TTL seconds; a version stamp in the shared cache, bumped by
+# signals.py once a save/delete commits and read at most every
+# VERSION_CHECK_EVERY seconds, makes every process reload soon after. An id a form sends that isn't in the table also reloads it (at
+# most every MISS_RELOAD_AFTER seconds), so a new row is never rejected
+# because a bump went missing. The rows are shared between requests: read
+# them, don't modify them.
+
+LOOKUP_TTL = 60 * 10
+MISS_RELOAD_AFTER = 5  # seconds
+# A process reads the shared stamp at most this often, not on every lookup
+VERSION_CHECK_EVERY = 2  # seconds
+LOOKUP_VERSION_KEY = 'recipes:lookups:version'
+LOOKUP_MODELS = (Category, Region, Festival)
+
+_tables = {}  # model -> (version, loaded at, rows, rows by id)
+_lock = threading.Lock()
+_version = {'value': None, 'read_at': 0}
+
+
+def lookup_version():
+    now = time.monotonic()
+    if _version['value'] is None or now - _version['read_at'] > VERSION_CHECK_EVERY:
+        # Start from a timestamp so an evicted version never matches a stale table
+        _version.update(value=cache.get_or_set(LOOKUP_VERSION_KEY, int(time.time() * 1000), None), read_at=now)
+    return _version['value']
+
+
+def bump_lookup_version():
+    try:
+        cache.incr(LOOKUP_VERSION_KEY)
+    except ValueError:
+        cache.set(LOOKUP_VERSION_KEY, int(time.time() * 1000), None)
+    # This process sees its own change right away
+    _version['value'] = None
+
+
+def _table(model, max_age=LOOKUP_TTL):
+    version = lookup_version()
+    entry = _tables.get(model)
+    if entry is None or entry[0] != version or time.monotonic() - entry[1] > max_age:
+        with _lock:
+            entry = _tables.get(model)
+            if entry is None or entry[0] != version or time.monotonic() - entry[1] > max_age:
+                rows = tuple(model.objects.order_by('pk'))
+                entry = (version, time.monotonic(), rows, {row.pk: row for row in rows})
+                _tables[model] = entry
+    return entry
+
+
+def all_rows(model):
+    """Every row of a reference table, in id order."""
+    return _table(model)[2]
+
+
+def get_row(model, pk):
+    """The row with this id (as sent by a form), or None."""
+    try:
+        pk = int(pk)
+    except (TypeError, ValueError):
+        return None
+    row = _table(model)[3].get(pk)
+    if row is None:
+        # Maybe added in another process a moment ago
+        row = _table(model, max_age=MISS_RELOAD_AFTER)[3].get(pk)
+    return row
+
+
+def categories():
+    return all_rows(Category)
+
+
+def regions():
+    return all_rows(Region)
+
+
+def festivals():
+    return all_rows(Festival)
+
+
+def form_choices():
+    """Context for the upload/edit recipe dropdowns."""
+    return {'categories': categories(), 'regions': regions(), 'festivals': festivals()}
@@ -0,0 +1,32 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.export import EXPORT_CHUNK_SIZE, FORMATS, export_stream
+
+
+class Command(BaseCommand):
+    help = "Stream the recipe catalog (with ingredients and counters) as CSV or JSON Lines."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--gzip', action='store_true', help="Gzip the output.")
+        parser.add_argument('--output', '-o', help="File to write (default: stdout).")
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE, help="Recipes fetched per round trip.")
+
+    def handle(self, *args, **options):
+        chunks = export_stream(options['format'], options['gzip'], options['chunk_size'])
+        try:
+            out = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        except OSError as e:
+            raise CommandError(e)
+        try:
+            for chunk in chunks:
+                out.write(chunk)
+        finally:
+            if options['output']:
+                out.close()
+            else:
+                out.flush()
+        if options['output']:
+            self.stderr.write(self.style.SUCCESS(f"Exported to {options['output']}."))
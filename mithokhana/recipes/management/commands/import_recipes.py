@@ -0,0 +1,47 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.importer import IMPORT_BATCH_SIZE, Lookups, import_recipes, read_rows
+
+
+class Command(BaseCommand):
+    help = "Bulk-import recipes with ingredients and festival links from a JSONL or CSV file. Safe to re-run."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import (.jsonl or .csv).")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Default: from the file extension.")
+        parser.add_argument('--source', help="Prefix for the duplicate-detection key (default: the file name).")
+        parser.add_argument('--author', help="Username for rows without a (known) author.")
+        parser.add_argument('--no-create', action='store_true',
+                            help="Reject rows naming an unknown category, region or festival instead of creating it.")
+        parser.add_argument('--batch', type=int, default=IMPORT_BATCH_SIZE, help="Recipes per transaction.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+        source = options['source'] or os.path.basename(path)
+
+        lookups = Lookups(default_author=options['author'], create_missing=not options['no_create'])
+        if options['author'] and lookups.user_id_for(options['author']) is None:
+            raise CommandError(f"User {options['author']!r} does not exist.")
+
+        def progress(created, skipped, failed):
+            self.stdout.write(f"  {created} imported, {skipped} already present, {failed} rejected")
+
+        try:
+            f = open(path, newline='', encoding='utf-8')
+        except OSError as e:
+            raise CommandError(e)
+        with f:
+            created, skipped, errors = import_recipes(
+                read_rows(f, fmt), source, lookups, batch_size=options['batch'], progress=progress
+            )
+
+        for number, message in errors[:20]:
+            self.stderr.write(f"line {number}: {message}")
+        if len(errors) > 20:
+            self.stderr.write(f"... and {len(errors) - 20} more")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {created} recipe(s); {skipped} already present, {len(errors)} rejected."
+        ))
@@ -0,0 +1,70 @@
+from django.core.files import File
+from django.core.management.base import BaseCommand
+
+from recipes.pagecache import bump_page_version
+from recipes.signals import MEDIA_FIELDS, touch_recipes, touch_profiles
+from recipes.models import Recipe, Profile
+from recipes.storage import media_storage, is_cas_name, recount_media_refs, purge_unreferenced_media
+
+
+class Command(BaseCommand):
+    help = "Move existing recipe/profile media into the content-addressed layout (cas/<aa>/<bb>/<sha256>.<ext>)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would be moved.")
+        parser.add_argument('--delete-old', action='store_true', help="Delete the old files once nothing references them.")
+
+    def handle(self, *args, **options):
+        storage = media_storage()
+        dry_run = options['dry_run']
+        moved, missing = {}, set()
+        changed = {Recipe: set(), Profile: set()}
+
+        for model, fields in MEDIA_FIELDS.items():
+            for field in fields:
+                rows = model.objects.exclude(**{field: ''}).exclude(**{field: None}).values_list('pk', field)
+                for pk, old_name in rows.iterator():
+                    if is_cas_name(old_name):
+                        continue
+                    if old_name not in moved:
+                        if not storage.exists(old_name):
+                            missing.add(old_name)
+                            continue
+                        if dry_run:
+                            moved[old_name] = None
+                        else:
+                            with storage.open(old_name) as f:
+                                moved[old_name] = storage.save(old_name, File(f))
+                    if moved.get(old_name):
+                        # .update(): no save() signals, refs are recounted below
+                        model.objects.filter(pk=pk).update(**{field: moved[old_name]})
+                        changed[model].add(pk)
+
+        for name in sorted(missing):
+            self.stderr.write(f"Missing file, left as is: {name}")
+
+        if dry_run:
+            self.stdout.write(f"Would move {len(moved)} file(s).")
+            return
+
+        refs = recount_media_refs(MEDIA_FIELDS)
+        purged = purge_unreferenced_media()
+        touch_recipes(changed[Recipe])
+        touch_profiles(profile_ids=changed[Profile])
+        bump_page_version()
+
+        deleted = 0
+        if options['delete_old']:
+            for old_name in moved:
+                still_used = any(
+                    model.objects.filter(**{field: old_name}).exists()
+                    for model, fields in MEDIA_FIELDS.items() for field in fields
+                )
+                if not still_used:
+                    storage.delete(old_name)
+                    deleted += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Moved {len(moved)} file(s) into {len(set(moved.values()))} unique blob(s); "
+            f"{len(refs)} blob(s) referenced, {purged} unreferenced blob(s) purged; deleted {deleted} old file(s)."
+        ))
@@ -0,0 +1,57 @@
+import io
+import os
+import pstats
+import re
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# <time>-<view name>-<ms>ms-<pid>-<random>.prof, as written by ProfilingMiddleware
+DUMP_RE = re.compile(r'^(?P<time>[^-]+)-(?P<view>.+)-(?P<ms>\d+)ms-\d+-\w+\.prof$')
+
+
+class Command(BaseCommand):
+    help = "Summarize request profiles written by ProfilingMiddleware: timings per view and the top functions."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', help="Profile directory (default: settings.PROFILE_DIR).")
+        parser.add_argument('--view', help="Only dumps whose view name contains this text.")
+        parser.add_argument('--sort', choices=['cumulative', 'tottime', 'ncalls'], default='cumulative')
+        parser.add_argument('--limit', type=int, default=30, help="Functions to list.")
+        parser.add_argument('--clear', action='store_true', help="Delete the dumps after reporting.")
+
+    def handle(self, *args, **options):
+        directory = options['dir'] or str(getattr(settings, 'PROFILE_DIR', os.path.join(settings.BASE_DIR, 'profiles')))
+        if not os.path.isdir(directory):
+            raise CommandError(f"No profile directory at {directory}.")
+
+        dumps, timings = [], defaultdict(list)
+        for name in sorted(os.listdir(directory)):
+            match = DUMP_RE.match(name)
+            if not match or (options['view'] and options['view'] not in match['view']):
+                continue
+            dumps.append(os.path.join(directory, name))
+            timings[match['view']].append(int(match['ms']))
+        if not dumps:
+            self.stdout.write("No matching profiles.")
+            return
+
+        self.stdout.write(f"{len(dumps)} profiled request(s)\n")
+        self.stdout.write(f"{'view':40} {'count':>6} {'mean ms':>9} {'max ms':>8}")
+        for view, ms in sorted(timings.items(), key=lambda item: -sum(item[1])):
+            self.stdout.write(f"{view[:40]:40} {len(ms):>6} {sum(ms) / len(ms):>9.0f} {max(ms):>8}")
+        self.stdout.write('')
+
+        # pstats writes in fragments; self.stdout would end each one with a newline
+        out = io.StringIO()
+        stats = pstats.Stats(dumps[0], stream=out)
+        for path in dumps[1:]:
+            stats.add(path)
+        stats.strip_dirs().sort_stats(options['sort']).print_stats(options['limit'])
+        self.stdout.write(out.getvalue())
+
+        if options['clear']:
+            for path in dumps:
+                os.remove(path)
+            self.stdout.write(self.style.SUCCESS(f"Deleted {len(dumps)} profile(s)."))
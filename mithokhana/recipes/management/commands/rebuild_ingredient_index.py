@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from recipes.pantry import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the ingredient search index (IngredientTerm) from Ingredient names."
+
+    def add_arguments(self, parser):
+        parser.add_argument('recipe_ids', nargs='*', type=int, help="Only these recipes (default: all).")
+        parser.add_argument('--batch', type=int, default=1000, help="Rows written per INSERT.")
+
+    def handle(self, *args, **options):
+        total = rebuild_index(options['recipe_ids'] or None, batch_size=options['batch'])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} ingredient(s)."))
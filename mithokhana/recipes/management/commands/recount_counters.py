@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from recipes.counters import recount_counters
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized follower, following, comment and reply counters and repair drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=1000, help="Rows checked per query.")
+
+    def handle(self, *args, **options):
+        fixed = recount_counters(batch_size=options['batch'])
+        for label, count in fixed.items():
+            self.stdout.write(f"{label}: {count} row(s) fixed")
+        self.stdout.write(self.style.SUCCESS(f"Repaired {sum(fixed.values())} counter(s)."))
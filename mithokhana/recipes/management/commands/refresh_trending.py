@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from recipes.trending import refresh_trending
+
+
+class Command(BaseCommand):
+    help = "Recompute the trending recipes table from recent likes, bookmarks, downloads and comments."
+
+    def handle(self, *args, **options):
+        total = refresh_trending()
+        self.stdout.write(self.style.SUCCESS(f"Ranked {total} trending recipe(s)."))
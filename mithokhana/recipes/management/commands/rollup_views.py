@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from recipes.viewcounts import flush_views, rollup_views
+
+
+class Command(BaseCommand):
+    help = "Roll raw recipe views up into daily counts and prune old raw views (run_tasks also does this hourly)."
+
+    def handle(self, *args, **options):
+        flush_views()
+        written, pruned = rollup_views()
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} daily count(s), pruned {pruned} raw view(s)."))
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes import tasks  # registers the @task functions
+from recipes.queue import prune_tasks, run_pending
+from recipes.storage import purge_unreferenced_media
+
+# How often an idle worker clears out finished task rows and unreferenced media
+PRUNE_EVERY = 60 * 60  # seconds
+
+
+class Command(BaseCommand):
+    help = "Run queued background tasks (post-upload processing and the like)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Drain the queue once and exit.")
+        parser.add_argument('--batch', type=int, default=10, help="Tasks claimed per round.")
+        parser.add_argument('--sleep', type=float, default=2.0, help="Seconds to wait when the queue is empty.")
+
+    def handle(self, *args, **options):
+        # Periodic jobs re-queue themselves; make sure the chain is running
+        tasks.schedule_trending()
+        tasks.schedule_rollup()
+        total = 0
+        last_prune = 0
+        while True:
+            ran = run_pending(options['batch'])
+            total += ran
+            if ran:
+                continue
+            if time.monotonic() - last_prune >= PRUNE_EVERY:
+                prune_tasks()
+                purge_unreferenced_media()
+                last_prune = time.monotonic()
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f"Ran {total} task(s)."))
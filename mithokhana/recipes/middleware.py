@@ -0,0 +1,164 @@
+import cProfile
+import logging
+import mimetypes
+import os
+import random
+import re
+import time
+import uuid
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed, SuspiciousFileOperation
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+from .staticfiles import is_hashed
+from .storage import CAS_PREFIX
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------
+# Static files without a front-end server
+# -------------------------------
+# Serves STATIC_ROOT (as written by collectstatic) and the content-addressed
+# part of MEDIA_ROOT (storage.py) before any session or auth work happens.
+# Hashed names never change content, so they are cached for a year as
+# immutable; the precompressed .br/.gz siblings are picked by Accept-Encoding.
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Unhashed names (e.g. something linked without {% static %}) may change
+UNHASHED_CACHE_CONTROL = 'public, max-age=60'
+
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def accepted_encodings(header):
+    """Content codings with a non-zero q-value in an Accept-Encoding header."""
+    accepted = set()
+    for part in (header or '').split(','):
+        coding, _, params = part.partition(';')
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding.strip() and q > 0:
+            accepted.add(coding.strip().lower())
+    if '*' in accepted:
+        accepted.update(coding for coding, _ in ENCODINGS)
+    return accepted
+
+
+class StaticFilesMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if not getattr(settings, 'SERVE_STATIC_FILES', False):
+            raise MiddlewareNotUsed
+        # (url prefix, directory, every name is immutable)
+        self.mounts = []
+        static_url, media_url = settings.STATIC_URL or '', settings.MEDIA_URL or ''
+        if settings.STATIC_ROOT and '://' not in static_url:
+            self.mounts.append(('/' + static_url.lstrip('/'), str(settings.STATIC_ROOT), False))
+        if settings.MEDIA_ROOT and '://' not in media_url:
+            self.mounts.append(
+                ('/' + media_url.lstrip('/') + CAS_PREFIX, os.path.join(settings.MEDIA_ROOT, CAS_PREFIX), True)
+            )
+        if not self.mounts:
+            raise MiddlewareNotUsed
+
+    def __call__(self, request):
+        if request.method in ('GET', 'HEAD'):
+            for prefix, root, immutable in self.mounts:
+                if request.path_info.startswith(prefix):
+                    response = self.serve(request, root, request.path_info[len(prefix):], immutable)
+                    if response is not None:
+                        return response
+        return self.get_response(request)
+
+    def serve(self, request, root, name, immutable=False):
+        try:
+            path = safe_join(root, name)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(path):
+            return None  # let the URLconf answer 404
+
+        variants = [(coding, path + suffix) for coding, suffix in ENCODINGS if os.path.isfile(path + suffix)]
+        accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING'))
+        coding, serve_path = next(((c, p) for c, p in variants if c in accepted), (None, path))
+
+        mtime = os.stat(serve_path).st_mtime
+        if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), mtime):
+            response = HttpResponseNotModified()
+        else:
+            content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+            response = FileResponse(open(serve_path, 'rb'), content_type=content_type)
+            if coding:
+                response['Content-Encoding'] = coding
+        response['Last-Modified'] = http_date(mtime)
+        response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if immutable or is_hashed(name) else UNHASHED_CACHE_CONTROL
+        if variants:
+            patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+# -------------------------------
+# Request profiling
+# -------------------------------
+# Opt-in (PROFILE_REQUESTS). Chosen requests run under cProfile and the
+# stats are dumped to PROFILE_DIR as
+# <time>-<view name>-<ms>ms-<pid>-<random>.prof, which `manage.py profile_report`
+# (or snakeviz, pstats) reads. Streaming bodies are produced after the
+# view returns and are not part of the profile.
+
+PROFILE_NAME_RE = re.compile(r'[^A-Za-z0-9_.]+')
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if not getattr(settings, 'PROFILE_REQUESTS', False):
+            raise MiddlewareNotUsed
+        self.sample_rate = getattr(settings, 'PROFILE_SAMPLE_RATE', 0)
+        pattern = getattr(settings, 'PROFILE_PATH_PATTERN', None)
+        self.path_re = re.compile(pattern) if pattern else None
+        self.directory = str(getattr(settings, 'PROFILE_DIR', None) or os.path.join(settings.BASE_DIR, 'profiles'))
+        os.makedirs(self.directory, exist_ok=True)
+
+    def wanted(self, request):
+        if self.path_re is not None and self.path_re.search(request.path_info):
+            return True
+        return random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if not self.wanted(request):
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already running in this thread
+            return self.get_response(request)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        match = request.resolver_match
+        view_name = PROFILE_NAME_RE.sub('_', match.view_name if match else 'unresolved')
+        filename = '%s-%s-%dms-%d-%s.prof' % (
+            time.strftime('%Y%m%dT%H%M%S'), view_name, elapsed_ms, os.getpid(), uuid.uuid4().hex[:6]
+        )
+        try:
+            profiler.dump_stats(os.path.join(self.directory, filename))
+        except OSError:
+            logger.exception("Could not write request profile %s", filename)
+        return response
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:42
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_counts(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Comment = apps.get_model('recipes', 'Comment')
+
+    def count_of(queryset, field):
+        counts = queryset.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(n=Count('pk')).values('n')
+        return Coalesce(Subquery(counts), Value(0))
+
+    Recipe.objects.update(comment_count=count_of(Comment.objects.all(), 'recipe'))
+    Comment.objects.update(reply_count=count_of(Comment.objects.all(), 'parent'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0027_recipe_updated_at_profile_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='reply_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Trigram indexes for the admin search fields. icontains compiles to
+# UPPER(col) LIKE UPPER('%...%') on PostgreSQL, which a GIN gin_trgm_ops
+# index on UPPER(col) can serve. Other databases, and PostgreSQL servers
+# without the pg_trgm contrib extension, skip this migration's SQL.
+
+from django.db import migrations
+
+TRIGRAM_INDEXES = [
+    ('recipe_title_trgm_idx', 'recipes_recipe', 'title'),
+    ('ingredient_name_trgm_idx', 'recipes_ingredient', 'name'),
+    ('festival_name_trgm_idx', 'recipes_festival', 'name'),
+]
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            # Without contrib, search still works; it just isn't indexed
+            return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin (UPPER({column}) gin_trgm_ops)'
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0029_task'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
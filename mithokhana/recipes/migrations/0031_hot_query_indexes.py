@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:49
+
+import django.db.models.functions.datetime
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0030_admin_search_trigram_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['recipe', 'parent', '-created_at', '-id'], name='comment_thread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['parent', 'created_at', 'id'], name='comment_replies_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='festival',
+            index=models.Index(django.db.models.functions.datetime.ExtractMonth('date'), name='festival_date_month_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(condition=models.Q(('is_chef', True)), fields=['user'], name='profile_chef_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-created_at', '-id'], name='recipe_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['category', 'region', '-created_at'], name='recipe_cat_region_idx'),
+        ),
+    ]
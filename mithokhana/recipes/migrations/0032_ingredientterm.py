@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0031_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngredientTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=50)),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terms', to='recipes.ingredient')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ingredient_terms', to='recipes.recipe')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term', 'recipe'], name='ingredient_term_idx')],
+                'constraints': [models.UniqueConstraint(fields=('ingredient', 'term'), name='unique_ingredient_term')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:10
+
+import recipes.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0033_searchquery'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('size', models.BigIntegerField(default=0)),
+                ('refs', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='profile',
+            name='photo',
+            field=models.ImageField(blank=True, null=True, storage=recipes.storage.media_storage, upload_to='profile_photos/'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=recipes.storage.media_storage, upload_to='recipes/'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='video',
+            field=models.FileField(blank=True, null=True, storage=recipes.storage.media_storage, upload_to='video/'),
+        ),
+    ]
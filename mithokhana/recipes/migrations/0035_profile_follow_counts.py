@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:20
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_counts(apps, schema_editor):
+    Profile = apps.get_model('recipes', 'Profile')
+    Follow = Profile.followers.through
+
+    def count_of(field, outer):
+        counts = Follow.objects.filter(**{field: OuterRef(outer)}).order_by().values(field).annotate(n=Count('pk')).values('n')
+        return Coalesce(Subquery(counts), Value(0))
+
+    Profile.objects.update(
+        follower_count=count_of('profile_id', 'pk'),
+        following_count=count_of('user_id', 'user_id'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0034_content_addressed_media'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='follower_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_counts, migrations.RunPython.noop),
+    ]
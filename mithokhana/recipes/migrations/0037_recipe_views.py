@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0036_trending'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeView',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('viewed_at', models.DateTimeField(db_index=True)),
+                ('recipe', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='recipes.recipe')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RecipeViewDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_views', to='recipes.recipe')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('recipe', 'day'), name='unique_recipe_view_day')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0037_recipe_views'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='import_key',
+            field=models.CharField(blank=True, editable=False, max_length=100, null=True, unique=True),
+        ),
+    ]
@@ -1,9 +1,12 @@
 from django.db import models
+from django.db.models.functions import ExtractMonth
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
+from .storage import media_storage
+
 # -------------------------------
 # Core Models
 # -------------------------------
@@ -26,6 +29,12 @@ class Festival(models.Model):
     description = models.TextField(blank=True)
     recipes = models.ManyToManyField('Recipe', related_name='festival_set', blank=True)
 
+    class Meta:
+        indexes = [
+            # festival_calendar filters on date__month
+            models.Index(ExtractMonth('date'), name='festival_date_month_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -34,16 +43,27 @@ class Recipe(models.Model):
     description = models.TextField()
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True)
     region = models.ForeignKey(Region, on_delete=models.SET_NULL, null=True, blank=True)
-    image = models.ImageField(upload_to='recipes/', blank=True, null=True)
-    video = models.FileField(upload_to='video/', blank=True, null=True)
+    image = models.ImageField(upload_to='recipes/', storage=media_storage, blank=True, null=True)
+    video = models.FileField(upload_to='video/', storage=media_storage, blank=True, null=True)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Bumped by ingredient, comment, like and bookmark changes too (see signals.py)
+    updated_at = models.DateTimeField(auto_now=True)
 
     likes = models.ManyToManyField(User, related_name='liked_recipes', blank=True)
     bookmarked_by = models.ManyToManyField(User, related_name='bookmarked_recipes', blank=True)
     download_count = models.PositiveIntegerField(default=0)
+    # Denormalized, kept in step by signals.py
+    comment_count = models.PositiveIntegerField(default=0)
     cook_time = models.PositiveIntegerField(default=0, help_text="Time in minutes")
+    # Set by bulk imports (importer.py) so a re-run skips what is already in
+    import_key = models.CharField(max_length=100, unique=True, null=True, blank=True, editable=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='recipe_created_at_idx'),
+            models.Index(fields=['category', 'region', '-created_at'], name='recipe_cat_region_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -58,6 +78,15 @@ class Comment(models.Model):
     text = models.TextField()
     parent = models.ForeignKey('self', null=True, blank=True, on_delete=models.CASCADE, related_name='replies')
     created_at = models.DateTimeField(auto_now_add=True)
+    # Denormalized, kept in step by signals.py
+    reply_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Cursor pages in comments.py: top-level newest first, replies oldest first
+            models.Index(fields=['recipe', 'parent', '-created_at', '-id'], name='comment_thread_idx'),
+            models.Index(fields=['parent', 'created_at', 'id'], name='comment_replies_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} on {self.text[:30]}"
@@ -72,6 +101,23 @@ class Ingredient(models.Model):
     def __str__(self):
         return f"{self.name} ({self.quantity})"
 
+class IngredientTerm(models.Model):
+    """Inverted index row: one normalized token of one ingredient (see pantry.py)."""
+    term = models.CharField(max_length=50)
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='ingredient_terms')
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE, related_name='terms')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['term', 'recipe'], name='ingredient_term_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['ingredient', 'term'], name='unique_ingredient_term'),
+        ]
+
+    def __str__(self):
+        return self.term
+
 # -------------------------------
 # User Profile
 # -------------------------------
@@ -79,7 +125,7 @@ class Ingredient(models.Model):
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     bio = models.TextField(blank=True)
-    photo = models.ImageField(upload_to='profile_photos/', blank=True, null=True)
+    photo = models.ImageField(upload_to='profile_photos/', storage=media_storage, blank=True, null=True)
     
     # Optional Chef Info
     is_chef = models.BooleanField(default=False)
@@ -88,15 +134,27 @@ class Profile(models.Model):
     
     #  Followers: users who follow this profile
     followers = models.ManyToManyField(User, related_name='following', blank=True)
+    # Denormalized, kept in step by signals.py
+    follower_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+    # Bumped by follow, bookmark and own-recipe changes too (see signals.py)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # chef_list and the anonymous user list only want chefs
+            models.Index(fields=['user'], condition=models.Q(is_chef=True), name='profile_chef_idx'),
+        ]
 
     def is_verified_chef(self):
         return self.is_chef and self.experience and self.specialty
     
     def total_followers(self):
-        return self.followers.count()
+        return self.follower_count
 
     def total_following(self):
-        return self.user.following.count()  # reverse lookup
+        return self.following_count
 
     def __str__(self):
         return self.user.username
@@ -110,3 +168,146 @@ def create_user_profile(sender, instance, created, **kwargs):
 def is_verified_chef(self):
     return self.is_chef and self.experience and self.specialty
 
+# -------------------------------
+# Background Tasks
+# -------------------------------
+
+class Task(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=200)
+    # Only one pending task per key, so re-enqueueing the same work is a no-op
+    key = models.CharField(max_length=200, blank=True)
+    args = models.JSONField(default=list, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='task_status_run_after_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['key'],
+                condition=models.Q(status='pending') & ~models.Q(key=''),
+                name='unique_pending_task_key',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} [{self.status}]"
+
+
+# -------------------------------
+# Search history (autocomplete popularity)
+# -------------------------------
+
+class SearchQuery(models.Model):
+    # Normalized: lowercased, single spaces
+    query = models.CharField(max_length=100, unique=True)
+    count = models.PositiveIntegerField(default=1)
+    last_searched = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-count'], name='search_query_count_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.query} ({self.count})"
+
+# -------------------------------
+# Media storage reference counts
+# -------------------------------
+
+class MediaBlob(models.Model):
+    """A content-addressed file (storage.py) and how many fields point at it."""
+    name = models.CharField(max_length=255, unique=True)
+    size = models.BigIntegerField(default=0)
+    refs = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.refs})"
+
+# -------------------------------
+# Trending (trending.py)
+# -------------------------------
+
+class InteractionEvent(models.Model):
+    """One like, bookmark, download or comment, kept for a trending window."""
+    LIKE = 'like'
+    BOOKMARK = 'bookmark'
+    DOWNLOAD = 'download'
+    COMMENT = 'comment'
+    KIND_CHOICES = [
+        (LIKE, 'Like'),
+        (BOOKMARK, 'Bookmark'),
+        (DOWNLOAD, 'Download'),
+        (COMMENT, 'Comment'),
+    ]
+
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='events')
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='event_created_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} on {self.recipe_id}"
+
+
+class TrendingRecipe(models.Model):
+    """Top recipes by decayed score, rewritten as a whole by refresh_trending()."""
+    recipe = models.OneToOneField(Recipe, on_delete=models.CASCADE, primary_key=True, related_name='trending')
+    rank = models.PositiveIntegerField(unique=True)
+    score = models.FloatField()
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['rank']
+
+    def __str__(self):
+        return f"#{self.rank} {self.recipe_id} ({self.score:.2f})"
+
+# -------------------------------
+# Recipe view counts (viewcounts.py)
+# -------------------------------
+
+class RecipeView(models.Model):
+    """One recipe_detail view; append-only, written in batches, pruned after rollup."""
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='+', db_constraint=False)
+    viewed_at = models.DateTimeField(db_index=True)
+
+
+class RecipeViewDaily(models.Model):
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='daily_views')
+    day = models.DateField()
+    views = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['recipe', 'day'], name='unique_recipe_view_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.recipe_id} {self.day}: {self.views}"
@@ -0,0 +1,122 @@
+import hashlib
+import re
+import time
+from functools import wraps
+
+from django.contrib import messages
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.cache import patch_vary_headers
+from django.utils.translation import get_language
+
+# -------------------------------
+# Full-page cache for anonymous visitors
+# -------------------------------
+# Anonymous GETs are answered from the cache, keyed on path + query string,
+# active language and a freshness stamp: the page version for list pages,
+# bumped by signals.py, or a per-object stamp such as recipe_stamp.
+#
+# Logged-in users, requests with pending flash messages and pages that
+# queue messages themselves are never cached. The page depends on both, so
+# "Vary: Cookie, Accept-Language" goes out on hits and misses alike
+# (LocaleMiddleware leaves Accept-Language out under a /en/ style prefix).
+#
+# Every page embeds a CSRF token (the language switcher), and that token is
+# per visitor. It is swapped for a placeholder when the page is stored and
+# a fresh token is filled in on each hit.
+
+PAGE_CACHE_TIMEOUT = 60 * 10
+PAGE_VERSION_KEY = 'recipes:pages:version'
+
+CSRF_PLACEHOLDER = b'__page_cache_csrf_token__'
+CSRF_INPUT_RE = re.compile(rb'name="csrfmiddlewaretoken" value="([A-Za-z0-9]+)"')
+
+# Recomputed for the new body on every hit
+SKIP_HEADERS = {'content-length'}
+
+
+def page_version():
+    # Start from a timestamp so an evicted version never collides with old keys
+    return cache.get_or_set(PAGE_VERSION_KEY, int(time.time() * 1000), None)
+
+
+def bump_page_version():
+    try:
+        cache.incr(PAGE_VERSION_KEY)
+    except ValueError:
+        cache.set(PAGE_VERSION_KEY, int(time.time() * 1000), None)
+
+
+def _pending_messages(request):
+    # len() loads the messages without marking them as shown
+    return len(messages.get_messages(request))
+
+
+def _freeze(request, response):
+    """A picklable copy of the response with the CSRF token taken out, or None."""
+    if response.status_code != 200 or response.streaming or response.cookies:
+        return None
+    cache_control = response.get('Cache-Control', '')
+    if 'private' in cache_control or 'no-store' in cache_control:
+        return None
+    if _pending_messages(request):
+        return None
+
+    content = response.content
+    if request.META.get('CSRF_COOKIE_NEEDS_UPDATE'):
+        match = CSRF_INPUT_RE.search(content)
+        if match is None:
+            return None  # token used somewhere we cannot find it again
+        content = content.replace(match.group(1), CSRF_PLACEHOLDER)
+
+    headers = [(k, v) for k, v in response.items() if k.lower() not in SKIP_HEADERS]
+    return content, headers
+
+
+def _thaw(request, entry):
+    content, headers = entry
+    if CSRF_PLACEHOLDER in content:
+        content = content.replace(CSRF_PLACEHOLDER, get_token(request).encode())
+    response = HttpResponse(content)
+    for key, value in headers:
+        response[key] = value
+    return response
+
+
+def anonymous_page_cache(stamp_func=None, timeout=PAGE_CACHE_TIMEOUT, on_hit=None):
+    """
+    Cache a view's page for anonymous GET/HEAD requests.
+
+    stamp_func(request, *args, **kwargs) returns a value that changes with
+    the page content (None: don't cache); the page version is used otherwise.
+    on_hit(request, *args, **kwargs) runs the view's side effects (counters
+    and the like) when a page is served from the cache.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (request.method not in ('GET', 'HEAD') or request.user.is_authenticated
+                    or _pending_messages(request)):
+                return view(request, *args, **kwargs)
+
+            stamp = stamp_func(request, *args, **kwargs) if stamp_func else page_version()
+            if stamp is None:
+                return view(request, *args, **kwargs)
+
+            raw = '%s|%s|%s' % (request.get_full_path(), get_language(), stamp)
+            key = 'recipes:page:%s' % hashlib.md5(raw.encode()).hexdigest()
+            entry = cache.get(key)
+            if entry is not None:
+                if on_hit:
+                    on_hit(request, *args, **kwargs)
+                response = _thaw(request, entry)
+            else:
+                response = view(request, *args, **kwargs)
+                entry = _freeze(request, response)
+                if entry is not None:
+                    cache.set(key, entry, timeout)
+            patch_vary_headers(response, ('Cookie', 'Accept-Language'))
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,160 @@
+import re
+
+from django.db import transaction
+from django.db.models import Count, FloatField, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Coalesce, Greatest
+
+from .models import Ingredient, IngredientTerm
+
+# -------------------------------
+# "Cook with what I have" ingredient search
+# -------------------------------
+# Ingredient.name is free text ("2 cups Basmati rice, washed"). Each name is
+# reduced to canonical tokens ("basmati", "rice") and stored in the
+# IngredientTerm table, so a pantry lookup is an indexed `term IN (...)`
+# instead of a scan over every ingredient row. A recipe ingredient counts as
+# covered when any of its tokens is in the pantry.
+
+# Words that describe how much or how it is prepared, not what it is
+STOPWORDS = {
+    'a', 'an', 'and', 'or', 'of', 'the', 'to', 'for', 'with', 'in', 'some', 'as', 'per',
+    'taste', 'needed', 'required', 'optional', 'handful', 'pinch', 'few',
+    'cup', 'cups', 'tbsp', 'tsp', 'tablespoon', 'tablespoons', 'teaspoon', 'teaspoons',
+    'g', 'gm', 'gram', 'grams', 'kg', 'ml', 'l', 'litre', 'liter', 'piece', 'pieces', 'pcs',
+    'fresh', 'chopped', 'sliced', 'diced', 'minced', 'grated', 'crushed', 'ground', 'whole',
+    'finely', 'roughly', 'thinly', 'boiled', 'dried', 'dry', 'raw', 'cooked', 'washed', 'soaked',
+    'peeled', 'large', 'medium', 'small', 'big', 'powder', 'paste', 'seed', 'seeds',
+}
+
+# Spelling variants and Nepali/Hindi names -> one canonical English token
+SYNONYMS = {
+    'chamal': 'rice', 'bhat': 'rice',
+    'dal': 'lentil', 'daal': 'lentil', 'dhal': 'lentil', 'masoor': 'lentil',
+    'aduwa': 'ginger', 'adua': 'ginger',
+    'lasun': 'garlic', 'lahsun': 'garlic',
+    'pyaj': 'onion', 'pyaaj': 'onion', 'scallion': 'onion',
+    'aalu': 'potato', 'aloo': 'potato', 'alu': 'potato',
+    'golbheda': 'tomato', 'tamatar': 'tomato',
+    'khursani': 'chili', 'chilli': 'chili', 'chile': 'chili', 'chilies': 'chili', 'chillies': 'chili',
+    'dhaniya': 'coriander', 'cilantro': 'coriander',
+    'besar': 'turmeric', 'haldi': 'turmeric',
+    'jeera': 'cumin', 'jira': 'cumin',
+    'ghiu': 'ghee',
+    'dahi': 'yogurt', 'curd': 'yogurt', 'yoghurt': 'yogurt',
+    'kukhura': 'chicken',
+    'khasi': 'mutton', 'goat': 'mutton',
+    'tel': 'oil', 'nun': 'salt', 'chini': 'sugar',
+    'maida': 'flour', 'atta': 'flour', 'aata': 'flour',
+    'chana': 'chickpea', 'garbanzo': 'chickpea',
+    'capsicum': 'pepper',
+    'bhanta': 'eggplant', 'brinjal': 'eggplant', 'aubergine': 'eggplant',
+    'bhindi': 'okra', 'ramtoriya': 'okra',
+    'leaves': 'leaf',
+}
+
+# Latin letters plus the Devanagari block (its vowel signs are not \w letters)
+WORD_RE = re.compile(r'(?:[^\W\d_]|[\u0900-\u097F])+')
+
+TERM_MAX_LENGTH = IngredientTerm._meta.get_field('term').max_length
+
+
+def singularize(word):
+    if len(word) <= 3 or word.endswith(('ss', 'us', 'is')):
+        return word
+    if word.endswith('ies'):
+        return word[:-3] + 'y'
+    # Only sibilant endings (and -oes) take -es: "cheeses" is cheese + s
+    if word.endswith(('oes', 'ches', 'shes', 'xes', 'sses')):
+        return word[:-2]
+    if word.endswith('s'):
+        return word[:-1]
+    return word
+
+
+def normalize_word(word):
+    word = word.lower()
+    if word in SYNONYMS:
+        return SYNONYMS[word]
+    word = singularize(word)
+    return SYNONYMS.get(word, word)
+
+
+def ingredient_terms(text):
+    """Canonical tokens for an ingredient name or a pantry list."""
+    terms = set()
+    for word in WORD_RE.findall(text or ''):
+        if word.lower() in STOPWORDS:
+            continue
+        term = normalize_word(word)
+        if term not in STOPWORDS:
+            terms.add(term[:TERM_MAX_LENGTH])
+    return terms
+
+# -------------------------------
+# Index maintenance
+# -------------------------------
+
+def index_ingredient(ingredient):
+    """Replace the index rows of one ingredient (called from post_save)."""
+    with transaction.atomic():
+        IngredientTerm.objects.filter(ingredient=ingredient).delete()
+        IngredientTerm.objects.bulk_create([
+            IngredientTerm(term=term, recipe_id=ingredient.recipe_id, ingredient=ingredient)
+            for term in ingredient_terms(ingredient.name)
+        ])
+
+
+def rebuild_index(recipe_ids=None, batch_size=1000):
+    """Rebuild the index for some recipes (or all); returns the number of ingredients indexed."""
+    ingredients = Ingredient.objects.order_by('pk').only('pk', 'recipe_id', 'name')
+    terms = IngredientTerm.objects.all()
+    if recipe_ids is not None:
+        ingredients = ingredients.filter(recipe_id__in=recipe_ids)
+        terms = terms.filter(recipe_id__in=recipe_ids)
+
+    with transaction.atomic():
+        terms.delete()
+        rows, total = [], 0
+        for ingredient in ingredients.iterator(chunk_size=batch_size):
+            total += 1
+            rows.extend(
+                IngredientTerm(term=term, recipe_id=ingredient.recipe_id, ingredient_id=ingredient.pk)
+                for term in ingredient_terms(ingredient.name)
+            )
+            if len(rows) >= batch_size:
+                IngredientTerm.objects.bulk_create(rows)
+                rows = []
+        IngredientTerm.objects.bulk_create(rows)
+    return total
+
+# -------------------------------
+# Pantry ranking
+# -------------------------------
+
+def pantry_rank(recipes, pantry):
+    """
+    Narrow `recipes` to those using anything in `pantry` (free text) and rank
+    them by the share of their ingredients the pantry covers.
+
+    Adds `pantry_matched`, `pantry_total` and `pantry_coverage` (0..1).
+    """
+    terms = ingredient_terms(pantry)
+    if not terms:
+        return recipes.none()
+
+    ingredient_total = (
+        Ingredient.objects.filter(recipe_id=OuterRef('pk'))
+        .order_by().values('recipe_id').annotate(n=Count('*')).values('n')
+    )
+    return (
+        recipes.filter(ingredient_terms__term__in=terms)
+        .annotate(
+            # Counts over the filtered join, i.e. only the matching terms
+            pantry_matched=Count('ingredient_terms__ingredient', distinct=True),
+            pantry_total=Coalesce(Subquery(ingredient_total, output_field=IntegerField()), Value(0)),
+        )
+        .annotate(
+            pantry_coverage=Cast('pantry_matched', FloatField()) / Greatest('pantry_total', Value(1)),
+        )
+        .order_by('-pantry_coverage', '-pantry_matched', '-created_at', '-id')
+    )
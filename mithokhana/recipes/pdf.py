@@ -0,0 +1,148 @@
+import hashlib
+import io
+from textwrap import wrap
+
+import qrcode
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+# -------------------------------
+# Recipe PDF rendering
+# -------------------------------
+# PDFs only depend on the recipe, so they are pre-rendered in the background
+# (see tasks.render_recipe_pdf) and stored under MEDIA_ROOT/pdfs/<pk>/,
+# named after a hash of what the PDF shows so an edit never serves a stale
+# file. (Not updated_at: likes, bookmarks and comments bump that too.)
+
+PDF_DIR = 'pdfs'
+
+
+def pdf_content_stamp(recipe):
+    """Hash of everything build_recipe_pdf draws."""
+    content = [
+        recipe.title,
+        recipe.category.name if recipe.category else None,
+        recipe.region.name if recipe.region else None,
+        recipe.cook_time,
+        recipe.created_by.username,
+        recipe.image.name if recipe.image else None,
+        list(recipe.ingredients.order_by('id').values_list('quantity', 'name')),
+        recipe.description,
+        settings.SITE_DOMAIN,
+    ]
+    return hashlib.sha1(repr(content).encode()).hexdigest()[:16]
+
+
+def cached_pdf_name(recipe):
+    return f"{PDF_DIR}/{recipe.pk}/{pdf_content_stamp(recipe)}.pdf"
+
+
+def build_recipe_pdf(recipe, out):
+    """Draw the recipe onto `out`, any writable file-like object."""
+    # ✅ Initialize canvas
+    p = canvas.Canvas(out, pagesize=A4)
+    width, height = A4
+    y = height - 50
+
+    # ✅ Title
+    p.setFont("Helvetica-Bold", 18)
+    p.drawString(50, y, f"🍽 {recipe.title}")
+    y -= 30
+
+    # ✅ Metadata
+    p.setFont("Helvetica", 12)
+    p.drawString(50, y, f"Category: {recipe.category.name if recipe.category else 'N/A'}")
+    y -= 20
+    p.drawString(50, y, f"Region: {recipe.region.name if recipe.region else 'N/A'}")
+    y -= 20
+    p.drawString(50, y, f"Cook Time: {recipe.cook_time} minutes")
+    y -= 20
+    p.drawString(50, y, f"Uploaded by: {recipe.created_by.username}")
+    y -= 30
+
+    # ✅ Image (if exists)
+    if recipe.image:
+        try:
+            img = ImageReader(recipe.image.path)
+            p.drawImage(img, 50, y - 200, width=200, height=150, preserveAspectRatio=True)
+            y -= 220
+        except Exception as e:
+            p.setFont("Helvetica-Oblique", 10)
+            p.drawString(50, y, f"(Image failed to load: {str(e)})")
+            y -= 20
+
+    # ✅ Ingredients
+    ingredients = recipe.ingredients.all()
+    if ingredients:
+        p.setFont("Helvetica-Bold", 13)
+        p.drawString(50, y, "🧂 Ingredients:")
+        y -= 20
+        p.setFont("Helvetica", 11)
+        for ing in ingredients:
+            line = f"- {ing.quantity} {ing.name}".strip()
+            p.drawString(60, y, line)
+            y -= 15
+            if y < 100:
+                p.showPage()
+                y = height - 50
+                p.setFont("Helvetica", 11)
+
+
+    # ✅ Description
+    y -= 10
+    p.setFont("Helvetica-Bold", 13)
+    p.drawString(50, y, "📖 Description:")
+    y -= 20
+    p.setFont("Helvetica", 11)
+    desc_lines = wrap(recipe.description or "", 90)
+    for line in desc_lines:
+        p.drawString(50, y, line)
+        y -= 15
+        if y < 100:
+            p.showPage()
+            y = height - 50
+            p.setFont("Helvetica", 11)
+
+    # ✅ QR Code linking to the online recipe
+    p.setFont("Helvetica-Bold", 12)
+    p.drawString(50, y, "🔗 View this recipe online:")
+    y -= 20
+    recipe_url = f"{settings.SITE_DOMAIN}/recipe/{recipe.pk}/"  # SITE_DOMAIN must be defined in settings
+
+    qr = qrcode.make(recipe_url)
+    qr_io = io.BytesIO()
+    qr.save(qr_io, format='PNG')
+    qr_io.seek(0)
+    qr_image = ImageReader(qr_io)
+    p.drawImage(qr_image, 50, y - 100, width=100, height=100)
+    y -= 120
+
+    # ✅ Footer
+    p.setFont("Helvetica-Oblique", 10)
+    p.drawString(50, 50, "Downloaded from Mitho Khana 🍛")
+
+    # ✅ Finalize
+    p.showPage()
+    p.save()
+
+
+def store_recipe_pdf(recipe):
+    name = cached_pdf_name(recipe)
+    if default_storage.exists(name):
+        return name
+
+    buffer = io.BytesIO()
+    build_recipe_pdf(recipe, buffer)
+    default_storage.save(name, ContentFile(buffer.getvalue()))
+
+    # Drop renders of older versions of this recipe
+    folder = f"{PDF_DIR}/{recipe.pk}"
+    _, files = default_storage.listdir(folder)
+    for filename in files:
+        if f"{folder}/{filename}" != name:
+            default_storage.delete(f"{folder}/{filename}")
+    return name
@@ -0,0 +1,95 @@
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Recipe, Profile
+from .viewcounts import chef_view_stats
+
+# -------------------------------
+# Profile page data
+# -------------------------------
+# The header numbers come from one query on the profile row (the follow
+# counters plus correlated COUNT subqueries) and are cached per user;
+# signals.py forgets them through touch_profiles() on follow, like,
+# bookmark and recipe changes. The recipe and bookmark grids are paginated
+# with the cached counts, so the page never runs a COUNT(*) of its own.
+
+PROFILE_STATS_TIMEOUT = 60 * 15
+PROFILE_PAGE_SIZE = 12
+# The grids only show these
+GRID_FIELDS = ('pk', 'title', 'image', 'created_at')
+
+
+def _count(queryset, field):
+    # Grouping by the correlated column yields one row, so no outer GROUP BY
+    counts = queryset.order_by().values(field).annotate(n=Count('*')).values('n')
+    return Coalesce(Subquery(counts), Value(0))
+
+
+def _stats_annotations():
+    return {
+        'recipes_count': _count(Recipe.objects.filter(created_by_id=OuterRef('user_id')), 'created_by_id'),
+        'bookmarks_count': _count(Recipe.bookmarked_by.through.objects.filter(user_id=OuterRef('user_id')), 'user_id'),
+        'likes_count': _count(
+            Recipe.likes.through.objects.filter(recipe__created_by_id=OuterRef('user_id')), 'recipe__created_by_id'
+        ),
+    }
+
+
+def _key(user_id):
+    return 'recipes:profilestats:%s' % user_id
+
+
+def profile_stats(profile):
+    """Header counts for a profile: followers, following, recipes, bookmarks, likes received."""
+    key = _key(profile.user_id)
+    stats = cache.get(key)
+    if stats is None:
+        annotations = _stats_annotations()
+        stats = (
+            Profile.objects.filter(pk=profile.pk).annotate(**annotations)
+            .values('follower_count', 'following_count', *annotations).first()
+        )
+        if stats is None:
+            return dict.fromkeys(['followers_count', 'following_count', *annotations], 0)
+        stats['followers_count'] = stats.pop('follower_count')
+        cache.set(key, stats, PROFILE_STATS_TIMEOUT)
+    return stats
+
+
+def forget_profile_stats(user_ids):
+    cache.delete_many([_key(user_id) for user_id in user_ids])
+
+
+def _page(request, queryset, param, count):
+    paginator = Paginator(queryset, PROFILE_PAGE_SIZE)
+    paginator.count = count  # from the cached stats; skips the COUNT(*)
+    return paginator.get_page(request.GET.get(param))
+
+
+def profile_page_context(request, profile):
+    """Context for profile.html: header stats plus one page of each grid."""
+    user = profile.user
+    stats = profile_stats(profile)
+    is_own_profile = request.user.pk == user.pk
+
+    recipes = Recipe.objects.filter(created_by_id=user.pk).only(*GRID_FIELDS).order_by('-created_at', '-id')
+    context = {
+        'user': user,
+        'profile': profile,
+        'stats': stats,
+        'my_recipes': _page(request, recipes, 'recipes_page', stats['recipes_count']),
+        'is_own_profile': is_own_profile,
+        'followers_count': stats['followers_count'],
+        'following_count': stats['following_count'],
+        'show_chef_badge': profile.is_chef,
+    }
+    # Bookmarks are private: only the owner sees them
+    if is_own_profile:
+        bookmarked = Recipe.objects.filter(bookmarked_by=user.pk).only(*GRID_FIELDS).order_by('-created_at', '-id')
+        context['bookmarked'] = _page(request, bookmarked, 'bookmarks_page', stats['bookmarks_count'])
+        # Chefs see how their recipes are read; from the daily rollup only
+        if profile.is_chef:
+            context['view_stats'] = chef_view_stats(user)
+    return context
@@ -0,0 +1,138 @@
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------
+# Database-backed task queue
+# -------------------------------
+# No external broker: tasks are rows in recipes_task, picked up by
+# `manage.py run_tasks`. With TASKS_ALWAYS_EAGER = True (e.g. in tests) they
+# run in-process right after the surrounding transaction commits.
+
+STALE_LOCK_AFTER = timedelta(minutes=10)
+RETRY_BACKOFF_SECONDS = 30
+# Finished rows are kept this long for inspection, then deleted by prune_tasks()
+KEEP_DONE = timedelta(days=1)
+KEEP_FAILED = timedelta(days=7)
+
+_registry = {}
+
+
+def task(func=None, *, max_attempts=3):
+    """
+    Register a function as a background task and give it a .delay() method:
+
+        @task
+        def render_recipe_pdf(recipe_id): ...
+
+        render_recipe_pdf.delay(recipe.pk, key=f"pdf:{recipe.pk}")
+    """
+    def wrap(func):
+        name = f"{func.__module__}.{func.__name__}"
+        _registry[name] = func
+        func.task_name = name
+        func.max_attempts = max_attempts
+        func.delay = lambda *args, key='', countdown=0: enqueue(func, *args, key=key, countdown=countdown)
+        return func
+    return wrap(func) if func else wrap
+
+
+def enqueue(func, *args, key='', countdown=0):
+    """Queue func(*args). Returns the Task, or None if it ran eagerly or was a duplicate."""
+    if getattr(settings, 'TASKS_ALWAYS_EAGER', False):
+        transaction.on_commit(lambda: func(*args))
+        return None
+
+    try:
+        with transaction.atomic():
+            return Task.objects.create(
+                name=func.task_name,
+                key=key,
+                args=list(args),
+                max_attempts=func.max_attempts,
+                run_after=timezone.now() + timedelta(seconds=countdown),
+            )
+    except IntegrityError:
+        # Same key already pending; that run will pick up the latest state
+        return None
+
+
+def _resolve(name):
+    if name not in _registry:
+        # Importing the module runs its @task decorators
+        import_string(name)
+    return _registry[name]
+
+
+def _claim(limit):
+    now = timezone.now()
+    with transaction.atomic():
+        # Workers that died mid-task leave rows locked; hand them back out,
+        # unless a newer run for the same key is already pending
+        stale = Task.objects.filter(status=Task.RUNNING, locked_at__lt=now - STALE_LOCK_AFTER)
+        pending_keys = Task.objects.filter(status=Task.PENDING).exclude(key='').values('key')
+        stale.filter(key__in=pending_keys).update(status=Task.DONE, locked_at=None)
+        # Only one row per key may be pending, so of several stale runs keep the newest
+        newest = list(stale.exclude(key='').values('key').annotate(newest=Max('id')).values_list('newest', flat=True))
+        stale.exclude(key='').exclude(id__in=newest).update(status=Task.DONE, locked_at=None)
+        stale.update(status=Task.PENDING, locked_at=None)
+
+        ids = list(
+            Task.objects.select_for_update(skip_locked=True)
+            .filter(status=Task.PENDING, run_after__lte=now)
+            .order_by('run_after', 'id')
+            .values_list('id', flat=True)[:limit]
+        )
+        Task.objects.filter(id__in=ids).update(status=Task.RUNNING, locked_at=now)
+    return Task.objects.filter(id__in=ids).order_by('run_after', 'id')
+
+
+def run_task(task_obj):
+    task_obj.attempts += 1
+    try:
+        _resolve(task_obj.name)(*task_obj.args)
+    except Exception:
+        task_obj.last_error = traceback.format_exc()
+        if task_obj.attempts < task_obj.max_attempts:
+            task_obj.status = Task.PENDING
+            task_obj.run_after = timezone.now() + timedelta(seconds=RETRY_BACKOFF_SECONDS * 2 ** (task_obj.attempts - 1))
+        else:
+            task_obj.status = Task.FAILED
+        logger.exception("Task %s (#%s) failed on attempt %s", task_obj.name, task_obj.pk, task_obj.attempts)
+    else:
+        task_obj.status = Task.DONE
+        task_obj.last_error = ''
+
+    task_obj.locked_at = None
+    try:
+        task_obj.save()
+    except IntegrityError:
+        # A retry collided with a newer pending task for the same key; that one wins
+        Task.objects.filter(pk=task_obj.pk).update(status=Task.DONE, locked_at=None)
+    return task_obj.status
+
+
+def run_pending(limit=10):
+    """Run up to `limit` due tasks and return how many were run."""
+    tasks = list(_claim(limit))
+    for task_obj in tasks:
+        run_task(task_obj)
+    return len(tasks)
+
+
+def prune_tasks(now=None):
+    """Delete finished tasks past their keep period; returns how many went."""
+    now = now or timezone.now()
+    deleted, _ = Task.objects.filter(status=Task.DONE, updated_at__lt=now - KEEP_DONE).delete()
+    failed, _ = Task.objects.filter(status=Task.FAILED, updated_at__lt=now - KEEP_FAILED).delete()
+    return deleted + failed
@@ -0,0 +1,331 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Recipe, Festival, Category, Region, Comment, Ingredient, Profile, InteractionEvent
+from .facets import bump_facet_version
+from .pantry import index_ingredient
+from .autocomplete import autocomplete_changed
+from .pagecache import bump_page_version
+from .lookups import bump_lookup_version
+from .storage import retain_media, release_media
+from .auth import forget_cached_users
+from .profiles import forget_profile_stats
+from .trending import record_events
+from .interactions import LIKED, BOOKMARKED, FOLLOWING, forget_interaction_ids
+
+# -------------------------------
+# Cache invalidation
+# -------------------------------
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Region)
+@receiver(post_delete, sender=Festival)
+def recipe_facets_changed(sender, **kwargs):
+    bump_facet_version()
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Region)
+@receiver(post_delete, sender=Region)
+def autocomplete_source_changed(sender, **kwargs):
+    autocomplete_changed()
+
+
+@receiver(post_delete, sender=Recipe)
+def autocomplete_recipe_deleted(sender, instance, **kwargs):
+    # An updated_at sync cannot see deleted rows, so name them
+    pk = instance.pk
+    transaction.on_commit(lambda: autocomplete_changed(deleted_recipe_ids=[pk]))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Region)
+@receiver(post_delete, sender=Region)
+@receiver(post_save, sender=Festival)
+@receiver(post_delete, sender=Festival)
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def cached_pages_changed(sender, update_fields=None, **kwargs):
+    # Logging in saves last_login only, which no cached page shows
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    bump_page_version()
+
+
+@receiver(m2m_changed, sender=Festival.recipes.through)
+@receiver(m2m_changed, sender=Recipe.likes.through)
+def cached_pages_m2m_changed(sender, action, **kwargs):
+    # The recipe list shows festival filters and like counts
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_page_version()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def cached_user_changed(sender, instance, **kwargs):
+    # Includes last_login and password changes; auth.py caches the whole user
+    forget_cached_users([instance.pk])
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def cached_user_profile_changed(sender, instance, **kwargs):
+    forget_cached_users([instance.user_id])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Region)
+@receiver(post_delete, sender=Region)
+@receiver(post_save, sender=Festival)
+@receiver(post_delete, sender=Festival)
+def lookup_table_changed(sender, **kwargs):
+    # After commit, or another process could reload the old rows under the new version
+    transaction.on_commit(bump_lookup_version)
+
+
+@receiver(m2m_changed, sender=Festival.recipes.through)
+def festival_recipes_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_facet_version()
+
+# -------------------------------
+# updated_at bumping (conditional GET validators)
+# -------------------------------
+
+def touch_recipes(recipe_ids):
+    # .update() skips save(), so this never re-fires post_save
+    Recipe.objects.filter(pk__in=recipe_ids).update(updated_at=timezone.now())
+
+
+def touch_profiles(user_ids=(), profile_ids=()):
+    Profile.objects.filter(Q(user_id__in=user_ids) | Q(pk__in=profile_ids)).update(updated_at=timezone.now())
+    user_ids = set(user_ids)
+    if profile_ids:
+        user_ids.update(Profile.objects.filter(pk__in=profile_ids).values_list('user_id', flat=True))
+    # request.user carries its profile, so the cached copies are stale now
+    forget_cached_users(user_ids)
+    forget_profile_stats(user_ids)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def recipe_child_changed(sender, instance, **kwargs):
+    touch_recipes([instance.recipe_id])
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, **kwargs):
+    # Covers upload_recipe, edit_recipe and the admin IngredientInline;
+    # deleted ingredients take their IngredientTerm rows with them (CASCADE)
+    index_ingredient(instance)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if not created:
+        touch_recipes([instance.recipe_id])
+        return
+    Recipe.objects.filter(pk=instance.recipe_id).update(
+        comment_count=F('comment_count') + 1, updated_at=timezone.now()
+    )
+    record_events(InteractionEvent.COMMENT, [instance.recipe_id], instance.user_id)
+    if instance.parent_id:
+        Comment.objects.filter(pk=instance.parent_id).update(reply_count=F('reply_count') + 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    # Greatest() keeps a drifted counter from going negative
+    Recipe.objects.filter(pk=instance.recipe_id).update(
+        comment_count=Greatest(F('comment_count') - 1, 0), updated_at=timezone.now()
+    )
+    if instance.parent_id:
+        Comment.objects.filter(pk=instance.parent_id).update(reply_count=Greatest(F('reply_count') - 1, 0))
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleting(sender, instance, **kwargs):
+    # The bookmark rows go with the recipe, so remember who had it
+    instance._bookmarker_ids = _bookmarker_ids(instance.pk)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_changed(sender, instance, created=False, **kwargs):
+    # The owner's profile lists their recipes, and bookmarkers' own profiles list their bookmarks
+    bookmarkers = [] if created else getattr(instance, '_bookmarker_ids', None)
+    if bookmarkers is None:
+        bookmarkers = _bookmarker_ids(instance.pk)
+    touch_profiles(user_ids=[instance.created_by_id, *bookmarkers])
+
+
+def _bookmarker_ids(recipe_id):
+    return list(Recipe.bookmarked_by.through.objects.filter(recipe_id=recipe_id).values_list('user_id', flat=True))
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, created, **kwargs):
+    if not created:
+        touch_profiles(user_ids=[instance.pk])
+
+
+def _m2m_pks(sender, instance, action, reverse, pk_set):
+    """
+    Return (forward_pks, reverse_pks) touched by an m2m change, i.e. the ids
+    on the model that declares the field and the ids on the related model.
+    """
+    if action in ('pre_clear', 'pre_remove'):
+        # pk_set is None on clear, and remove() reports every id it was given,
+        # linked or not, so remember the rows that really go away
+        source, target = [f for f in sender._meta.get_fields() if f.many_to_one]
+        if source.related_model is not type(instance):
+            source, target = target, source
+        links = sender.objects.filter(**{source.name: instance.pk})
+        if pk_set is not None:
+            links = links.filter(**{target.attname + '__in': pk_set})
+        instance._m2m_dropped = set(links.values_list(target.attname, flat=True))
+        return None
+    if action in ('post_clear', 'post_remove'):
+        pk_set = getattr(instance, '_m2m_dropped', set())
+    elif action != 'post_add':
+        return None
+
+    if reverse:
+        return pk_set, {instance.pk}
+    return {instance.pk}, pk_set
+
+
+def _sync_interaction_ids(kind, user_ids):
+    # Forget rather than patch, and only once the write is committed: a
+    # rollback, or a lazy load racing the write, would otherwise leave a
+    # set in the cache that doesn't match the table
+    user_ids = list(user_ids)
+    transaction.on_commit(lambda: forget_interaction_ids(kind, user_ids))
+
+
+def _record_added(kind, action, recipe_ids, user_ids):
+    # Trending only counts new interactions; removals just stop adding up
+    if action == 'post_add':
+        for user_id in user_ids:
+            record_events(kind, recipe_ids, user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.likes.through)
+def recipe_likes_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    pks = _m2m_pks(sender, instance, action, reverse, pk_set)
+    if pks:
+        recipe_ids, user_ids = pks
+        touch_recipes(recipe_ids)
+        # Authors' profiles show the likes they received
+        authors = Recipe.objects.filter(pk__in=recipe_ids).values_list('created_by_id', flat=True)
+        touch_profiles(user_ids=list(authors))
+        _sync_interaction_ids(LIKED, user_ids)
+        _record_added(InteractionEvent.LIKE, action, recipe_ids, user_ids)
+
+
+@receiver(m2m_changed, sender=Recipe.bookmarked_by.through)
+def recipe_bookmarks_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    pks = _m2m_pks(sender, instance, action, reverse, pk_set)
+    if pks:
+        recipe_ids, user_ids = pks
+        touch_recipes(recipe_ids)
+        # Bookmarks are shown on the bookmarking user's profile
+        touch_profiles(user_ids=user_ids)
+        _sync_interaction_ids(BOOKMARKED, user_ids)
+        _record_added(InteractionEvent.BOOKMARK, action, recipe_ids, user_ids)
+
+
+@receiver(m2m_changed, sender=Profile.followers.through)
+def profile_followers_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    pks = _m2m_pks(sender, instance, action, reverse, pk_set)
+    if pks:
+        profile_ids, user_ids = pks
+        if not (profile_ids and user_ids):
+            return
+        # One side is always a single row, so every row moves by the size of the other side
+        if action == 'post_add':
+            Profile.objects.filter(pk__in=profile_ids).update(follower_count=F('follower_count') + len(user_ids))
+            Profile.objects.filter(user_id__in=user_ids).update(following_count=F('following_count') + len(profile_ids))
+        else:
+            Profile.objects.filter(pk__in=profile_ids).update(
+                follower_count=Greatest(F('follower_count') - len(user_ids), 0)
+            )
+            Profile.objects.filter(user_id__in=user_ids).update(
+                following_count=Greatest(F('following_count') - len(profile_ids), 0)
+            )
+        # Followed profiles change their follower count, followers their following count;
+        # this also drops the cached request.user and profile stats of both sides
+        touch_profiles(user_ids=user_ids, profile_ids=profile_ids)
+        _sync_interaction_ids(FOLLOWING, user_ids)
+
+@receiver(pre_delete, sender=User)
+def follower_deleting(sender, instance, **kwargs):
+    # The cascade drops the follow rows without m2m_changed
+    followed = list(Profile.objects.filter(followers=instance).values_list('user_id', flat=True))
+    Profile.objects.filter(user_id__in=followed).update(follower_count=Greatest(F('follower_count') - 1, 0))
+    touch_profiles(user_ids=followed)
+
+
+@receiver(pre_delete, sender=Profile)
+def followed_profile_deleting(sender, instance, **kwargs):
+    followers = list(instance.followers.values_list('pk', flat=True))
+    Profile.objects.filter(user_id__in=followers).update(following_count=Greatest(F('following_count') - 1, 0))
+    touch_profiles(user_ids=followers)
+
+# -------------------------------
+# Media reference counts (storage.py)
+# -------------------------------
+
+MEDIA_FIELDS = {
+    Recipe: ('image', 'video'),
+    Profile: ('photo',),
+}
+
+
+def _media_names(instance):
+    return [getattr(instance, field).name or '' for field in MEDIA_FIELDS[type(instance)]]
+
+
+@receiver(pre_save, sender=Recipe)
+@receiver(pre_save, sender=Profile)
+def media_fields_saving(sender, instance, **kwargs):
+    old = None
+    if instance.pk:
+        old = sender.objects.filter(pk=instance.pk).values_list(*MEDIA_FIELDS[sender]).first()
+    instance._media_old = list(old or [''] * len(MEDIA_FIELDS[sender]))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Profile)
+def media_fields_saved(sender, instance, **kwargs):
+    old = getattr(instance, '_media_old', [''] * len(MEDIA_FIELDS[sender]))
+    new = _media_names(instance)
+    changed = [(o, n) for o, n in zip(old, new) if o != n]
+    retain_media([n for _, n in changed])
+    release_media([o for o, _ in changed])
+    instance._media_old = new
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Profile)
+def media_fields_deleted(sender, instance, **kwargs):
+    release_media(_media_names(instance))
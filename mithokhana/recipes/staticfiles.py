@@ -0,0 +1,77 @@
+import gzip
+import re
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, StaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:  # optional: without it only .gz copies are written
+    brotli = None
+
+# -------------------------------
+# Hashed + precompressed static files
+# -------------------------------
+# collectstatic writes content-hashed copies (logo.3f2a9c1b7e4d.png) plus a
+# manifest, and for text assets also .gz and .br siblings, so the serving
+# middleware never compresses at request time.
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.mjs', '.map', '.json', '.svg', '.txt', '.html', '.xml', '.ico')
+# Not worth a second file below this size or if it saves less than 5%
+MIN_COMPRESS_SIZE = 256
+MIN_SAVING = 0.95
+
+# ManifestFilesMixin inserts a 12 hex digit hash before the extension
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+
+
+def is_hashed(name):
+    return bool(HASHED_NAME_RE.search(name))
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    # A template pointing at a file that was never collected should render
+    # with the plain URL, not fail the whole page
+    manifest_strict = False
+
+    def url(self, name, force=False):
+        try:
+            return super().url(name, force)
+        except ValueError:
+            return StaticFilesStorage.url(self, name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        hashed = []
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                hashed.append(hashed_name)
+            yield name, hashed_name, processed
+
+        if dry_run:
+            return
+        for name in hashed:
+            for compressed_name in self.compress(name):
+                yield name, compressed_name, True
+
+    def compress(self, name):
+        """Write name.gz / name.br next to a text asset; returns the names written."""
+        if not name.lower().endswith(COMPRESSIBLE_EXTENSIONS):
+            return []
+        with self.open(name) as f:
+            content = f.read()
+        if len(content) < MIN_COMPRESS_SIZE:
+            return []
+
+        variants = [('.gz', gzip.compress(content, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(content)))
+
+        written = []
+        for suffix, data in variants:
+            if len(data) >= len(content) * MIN_SAVING:
+                continue
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            self._save(name + suffix, ContentFile(data))
+            written.append(name + suffix)
+        return written
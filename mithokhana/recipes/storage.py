@@ -0,0 +1,167 @@
+import hashlib
+import os
+import tempfile
+import time
+
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+# -------------------------------
+# Content-addressed media storage
+# -------------------------------
+# Uploads are stored as cas/<aa>/<bb>/<sha256><ext>, so identical bytes
+# share one file no matter how often they are uploaded, and a name never
+# changes content, which makes its URL cacheable forever.
+#
+# MediaBlob counts the model fields pointing at each file (signals.py keeps
+# it up to date); a file is deleted once nothing references it and it was
+# not stored or deduplicated within PURGE_GRACE_SECONDS.
+
+CAS_PREFIX = 'cas/'
+HASH_CHUNK_SIZE = 64 * 1024
+# A file stored or deduplicated this recently may be about to be referenced
+# by the model save that uploaded it, so purging leaves it alone (run_tasks
+# sweeps up what was skipped)
+PURGE_GRACE_SECONDS = 60
+
+
+def cas_name(digest, ext):
+    return '%s%s/%s/%s%s' % (CAS_PREFIX, digest[:2], digest[2:4], digest, ext)
+
+
+def is_cas_name(name):
+    return bool(name) and name.startswith(CAS_PREFIX)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # The stored name comes from the content, never from the upload name
+        return name
+
+    def _save(self, name, content):
+        ext = os.path.splitext(name)[1].lower()[:10]
+        tmp_dir = self.path('.cas-tmp')
+        os.makedirs(tmp_dir, exist_ok=True)
+
+        # Hash while writing to a temp file: one pass, bounded memory
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks(HASH_CHUNK_SIZE):
+                    digest.update(chunk)
+                    f.write(chunk)
+
+            final_name = cas_name(digest.hexdigest(), ext)
+            final_path = self.path(final_name)
+            try:
+                # Already stored: deduplicated. The new mtime tells purging
+                # that a reference to it is on its way.
+                os.utime(final_path)
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(tmp_path, self.file_permissions_mode)
+                # Atomic; a concurrent identical upload writes the same bytes
+                os.replace(tmp_path, final_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return final_name
+
+
+_media_storage = ContentAddressedStorage()
+
+
+def media_storage():
+    """Storage for Recipe.image/video and Profile.photo (a callable keeps migrations stable)."""
+    return _media_storage
+
+# -------------------------------
+# Reference counting
+# -------------------------------
+
+def retain_media(names):
+    from .models import MediaBlob
+
+    for name in filter(is_cas_name, names):
+        # Waits for a purge holding the row; if that purge deleted it, start over
+        if not MediaBlob.objects.filter(name=name).update(refs=F('refs') + 1):
+            blob, created = MediaBlob.objects.get_or_create(
+                name=name, defaults={'refs': 1, 'size': _size(name)}
+            )
+            if not created:
+                MediaBlob.objects.filter(pk=blob.pk).update(refs=F('refs') + 1)
+
+
+def release_media(names):
+    from .models import MediaBlob
+
+    names = [name for name in names if is_cas_name(name)]
+    if not names:
+        return
+    MediaBlob.objects.filter(name__in=names).update(refs=Greatest(F('refs') - 1, 0))
+    # Only once the row that dropped the reference is really gone
+    transaction.on_commit(lambda: purge_unreferenced_media(names))
+
+
+def purge_unreferenced_media(names=None):
+    """Delete blobs (and their files) nothing points at; returns how many."""
+    from .models import MediaBlob
+
+    blobs = MediaBlob.objects.filter(refs=0)
+    if names is not None:
+        blobs = blobs.filter(name__in=names)
+    purged = 0
+    for name in list(blobs.values_list('name', flat=True)):
+        with transaction.atomic():
+            # The row lock holds off retain_media until the file is gone, and
+            # refs is re-checked under it
+            if not MediaBlob.objects.select_for_update().filter(name=name, refs=0).exists():
+                continue
+            if _recently_stored(name):
+                continue
+            _media_storage.delete(name)
+            MediaBlob.objects.filter(name=name).delete()
+        purged += 1
+    return purged
+
+
+def _recently_stored(name):
+    try:
+        return time.time() - os.path.getmtime(_media_storage.path(name)) < PURGE_GRACE_SECONDS
+    except OSError:
+        return False
+
+
+def _size(name):
+    try:
+        return _media_storage.size(name)
+    except OSError:
+        return 0
+
+
+def recount_media_refs(fields):
+    """
+    Rebuild MediaBlob from the rows that actually reference each file.
+    `fields` maps model -> file field names; returns {name: refs}.
+    """
+    from collections import Counter
+    from .models import MediaBlob
+
+    counts = Counter()
+    for model, names in fields.items():
+        for row in model.objects.values_list(*names).iterator():
+            counts.update(name for name in row if is_cas_name(name))
+
+    with transaction.atomic():
+        MediaBlob.objects.exclude(name__in=list(counts)).update(refs=0)
+        for name, refs in counts.items():
+            MediaBlob.objects.update_or_create(name=name, defaults={'refs': refs, 'size': _size(name)})
+    return dict(counts)
@@ -0,0 +1,57 @@
+from django.conf import settings
+
+from .models import Recipe
+from .pdf import store_recipe_pdf
+from .queue import task
+from . import trending, viewcounts
+
+# -------------------------------
+# Background tasks
+# -------------------------------
+# Work that used to (or would) run inside upload_recipe/edit_recipe. Queue
+# with .delay(); run by `manage.py run_tasks`.
+
+
+@task
+def render_recipe_pdf(recipe_id):
+    recipe = Recipe.objects.select_related('category', 'region', 'created_by').filter(pk=recipe_id).first()
+    if recipe:
+        store_recipe_pdf(recipe)
+
+
+@task
+def process_recipe(recipe_id):
+    """Post-save processing for an uploaded or edited recipe."""
+    render_recipe_pdf(recipe_id)
+
+
+@task
+def refresh_trending():
+    """Recompute the trending table, then queue the next run."""
+    try:
+        trending.refresh_trending()
+    finally:
+        # Even after a failure: a retry that runs out of attempts would end the chain
+        schedule_trending(countdown=int(trending.REFRESH_INTERVAL.total_seconds()))
+
+
+def schedule_trending(countdown=0):
+    # Eager mode would run the chain forever inside the request
+    if not getattr(settings, 'TASKS_ALWAYS_EAGER', False):
+        refresh_trending.delay(key='refresh_trending', countdown=countdown)
+
+
+@task
+def rollup_views():
+    """Roll views up into daily counts, then queue the next run."""
+    try:
+        # This process's own buffer; web processes flush theirs on a timer
+        viewcounts.flush_views()
+        viewcounts.rollup_views()
+    finally:
+        schedule_rollup(countdown=int(viewcounts.ROLLUP_INTERVAL.total_seconds()))
+
+
+def schedule_rollup(countdown=0):
+    if not getattr(settings, 'TASKS_ALWAYS_EAGER', False):
+        rollup_views.delay(key='rollup_views', countdown=countdown)
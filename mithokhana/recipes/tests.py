@@ -1,3 +1,716 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from datetime import date, timedelta
 
-# Create your tests here.
+from django.contrib import messages
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone, translation
+from PIL import Image
+
+from . import autocomplete, viewcounts
+from .counters import recount_counters
+from .api import _id_list
+from .export import export_rows
+from .facets import facet_counts
+from .follows import followers_page
+from .forms import ProfileForm
+from .images import MAX_DIMENSION, prepare_image
+from .importer import Lookups, import_recipes, read_rows
+from .interactions import like_count_annotation
+from .models import (
+    Recipe, Category, Region, Comment, Festival, Ingredient, InteractionEvent, MediaBlob, Profile, RecipeView, RecipeViewDaily,
+    Task, TrendingRecipe,
+)
+from .pagecache import CSRF_PLACEHOLDER, CSRF_INPUT_RE, anonymous_page_cache, page_version
+from .pantry import singularize
+from .queue import STALE_LOCK_AFTER, KEEP_DONE, prune_tasks, run_pending, task
+from .storage import PURGE_GRACE_SECONDS, media_storage, purge_unreferenced_media
+from .trending import HALF_LIFE, decayed_scores, record_events, refresh_trending
+
+
+def seq_scanned_tables(plan):
+    """Relation names read by a Seq Scan anywhere in an EXPLAIN (FORMAT JSON) plan."""
+    found = set()
+    if plan.get('Node Type') == 'Seq Scan':
+        found.add(plan.get('Relation Name'))
+    for child in plan.get('Plans', []):
+        found |= seq_scanned_tables(child)
+    return found
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', "EXPLAIN plans are only checked on PostgreSQL")
+class HotQueryPlanTests(TestCase):
+    """
+    Run the querysets behind the hot views through EXPLAIN on a seeded table
+    and fail if one of them falls back to a sequential scan.
+    """
+    RECIPES = 20000
+    USERS = 5000
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.categories = Category.objects.bulk_create([Category(name=f"Category {i}") for i in range(20)])
+        cls.regions = Region.objects.bulk_create([Region(name=f"Region {i}") for i in range(20)])
+
+        users = User.objects.bulk_create([User(username=f"user{i}") for i in range(cls.USERS)])
+        # bulk_create skips the post_save signal that normally creates profiles
+        Profile.objects.bulk_create([Profile(user=u, is_chef=(i % 100 == 0)) for i, u in enumerate(users)])
+
+        recipes = Recipe.objects.bulk_create([
+            Recipe(
+                title=f"Recipe {i}",
+                description="Seeded",
+                category=cls.categories[i % 20],
+                region=cls.regions[(i // 20) % 20],
+                created_by=users[i % cls.USERS],
+            )
+            for i in range(cls.RECIPES)
+        ], batch_size=2000)
+
+        comments = Comment.objects.bulk_create([
+            Comment(recipe=recipes[i % 500], user=users[i % cls.USERS], text="Seeded")
+            for i in range(cls.RECIPES)
+        ], batch_size=2000)
+        Comment.objects.bulk_create([
+            Comment(recipe=c.recipe, user=c.user, text="Reply", parent=c) for c in comments[:5000]
+        ], batch_size=2000)
+
+        Festival.objects.bulk_create([
+            Festival(name=f"Festival {i}", date=date(2025, 1, 1) + timedelta(days=i % 365)) for i in range(5000)
+        ], batch_size=2000)
+
+        cls.recipe = recipes[0]
+        cls.comment = comments[0]
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def explain(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0]['Plan']
+
+    def assertNoSeqScan(self, queryset, *tables):
+        scanned = seq_scanned_tables(self.explain(queryset)) & set(tables)
+        self.assertFalse(scanned, f"Sequential scan on {', '.join(sorted(scanned))}:\n{queryset.query}")
+
+    def test_recipe_list_newest_first(self):
+        qs = Recipe.objects.annotate(like_count=like_count_annotation()).order_by('-created_at', '-id')[:12]
+        self.assertNoSeqScan(qs, 'recipes_recipe')
+
+    def test_recipe_list_category_region_filter(self):
+        qs = Recipe.objects.filter(
+            category=self.categories[3], region=self.regions[5]
+        ).order_by('-created_at', '-id')[:12]
+        self.assertNoSeqScan(qs, 'recipes_recipe')
+
+    def test_top_level_comments_page(self):
+        qs = Comment.objects.filter(recipe=self.recipe, parent=None).order_by('-created_at', '-id')[:11]
+        self.assertNoSeqScan(qs, 'recipes_comment')
+
+    def test_replies_page(self):
+        qs = Comment.objects.filter(parent=self.comment).order_by('created_at', 'id')[:11]
+        self.assertNoSeqScan(qs, 'recipes_comment')
+
+    def test_festival_month(self):
+        qs = Festival.objects.filter(date__month=5)
+        self.assertNoSeqScan(qs, 'recipes_festival')
+
+    def test_chef_list(self):
+        qs = User.objects.filter(profile__is_chef=True)
+        self.assertNoSeqScan(qs, 'recipes_profile')
+
+
+class IdListTests(SimpleTestCase):
+    def test_ignores_junk_and_duplicates(self):
+        self.assertEqual(_id_list('3, 1,x,3,,-2'), [3, 1])
+
+    def test_ignores_non_ascii_digits(self):
+        # '²'.isdigit() is True but int('²') raises
+        self.assertEqual(_id_list('1,²,٣'), [1])
+
+
+class SingularizeTests(SimpleTestCase):
+    def test_plurals_match_their_singular(self):
+        for plural, singular in [
+            ('cheeses', 'cheese'), ('sauces', 'sauce'), ('onions', 'onion'), ('tomatoes', 'tomato'),
+            ('peaches', 'peach'), ('radishes', 'radish'), ('boxes', 'box'), ('glasses', 'glass'),
+            ('berries', 'berry'), ('lentils', 'lentil'),
+        ]:
+            self.assertEqual(singularize(plural), singular)
+
+    def test_leaves_singulars_alone(self):
+        for word in ['cheese', 'rice', 'hummus', 'glass', 'pea']:
+            self.assertEqual(singularize(word), word)
+
+
+class ProfilePageTests(TestCase):
+    def setUp(self):
+        self.chef = User.objects.create_user(username='chef', password='pw')
+        self.fan = User.objects.create_user(username='fan', password='pw')
+        self.chef.profile.followers.add(self.fan)
+        Recipe.objects.create(title="Dal", description="Lentils", created_by=self.chef)
+
+    def test_renders_with_cold_stats_cache(self):
+        self.client.login(username='fan', password='pw')
+        cache.clear()
+        response = self.client.get(reverse('view_profile', args=['chef']))
+        self.assertEqual(response.status_code, 200)
+        stats = response.context['stats']
+        self.assertEqual((stats['followers_count'], stats['following_count'], stats['recipes_count']), (1, 0, 1))
+
+
+class ImportRecipesTests(TestCase):
+    def setUp(self):
+        User.objects.create_user(username='cook', password='pw')
+
+    def run_import(self, *rows):
+        lines = io.StringIO('\n'.join(row if isinstance(row, str) else json.dumps(row) for row in rows))
+        return import_recipes(read_rows(lines, 'jsonl'), 'test', Lookups(default_author='cook'))
+
+    def test_bad_rows_are_reported_and_the_rest_imported(self):
+        created, skipped, errors = self.run_import(
+            {'id': 1, 'title': "Dal bhat", 'category': "Dal", 'cook_time': '30', 'ingredients': ["rice", "lentils"]},
+            '[1, 2]',
+            '{not json',
+            {'id': 4, 'title': {'en': "Momo"}},
+            {'id': 5, 'title': "Sel roti", 'category': {'name': "Snack"}},
+            {'id': 6, 'title': "Gundruk", 'cook_time': -3},
+            {'id': 7, 'title': "Kheer", 'cook_time': 'soon'},
+            {'id': 8, 'title': "Aloo", 'ingredients': [["potato"]]},
+            {'id': 9, 'title': 5},
+        )
+        self.assertEqual((created, skipped), (2, 0))
+        self.assertEqual([number for number, _ in errors], [2, 3, 4, 5, 6, 7, 8])
+        self.assertEqual(sorted(Recipe.objects.values_list('title', flat=True)), ["5", "Dal bhat"])
+        self.assertEqual(Recipe.objects.get(title="Dal bhat").ingredients.count(), 2)
+
+    def test_rerun_skips_imported_rows_and_rejects_the_same_bad_ones(self):
+        rows = ({'id': 1, 'title': "Dal bhat"}, {'id': 2, 'title': "Gundruk", 'cook_time': -3})
+        self.assertEqual(self.run_import(*rows)[:2], (1, 0))
+        created, skipped, errors = self.run_import(*rows)
+        self.assertEqual((created, skipped, [number for number, _ in errors]), (0, 1, [2]))
+
+
+class RecipeCardsApiTests(TestCase):
+    def test_non_numeric_filter_ids_are_rejected(self):
+        for param in ['category', 'region', 'festival']:
+            response = self.client.get(reverse('api_recipe_cards'), {param: 'x'})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(param, response.json()['error'])
+
+    def test_filters_by_category(self):
+        user = User.objects.create_user(username='cook')
+        dal, snack = Category.objects.create(name="Dal"), Category.objects.create(name="Snack")
+        Recipe.objects.create(title="Dal bhat", description="", category=dal, created_by=user)
+        Recipe.objects.create(title="Sel roti", description="", category=snack, created_by=user)
+        response = self.client.get(reverse('api_recipe_cards'), {'category': dal.pk, 'fields': 'title'})
+        self.assertEqual(response.json()['results'], [{'title': "Dal bhat"}])
+
+
+class FacetCountTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='cook')
+        self.dal, self.snack = Category.objects.create(name="Dal"), Category.objects.create(name="Snack")
+        self.hills = Region.objects.create(name="Hills")
+        self.dashain = Festival.objects.create(name="Dashain", date=date(2025, 10, 2))
+        self.tihar = Festival.objects.create(name="Tihar", date=date(2025, 10, 21))
+
+        # In two festivals: still one recipe in the category and region counts
+        both = Recipe.objects.create(title="Sel roti", description="", category=self.snack, region=self.hills, created_by=user)
+        both.festival_set.set([self.dashain, self.tihar])
+        Recipe.objects.create(title="Dal bhat", description="rice", category=self.dal, region=self.hills, created_by=user)
+
+    def test_counts_each_recipe_once(self):
+        counts = facet_counts()
+        self.assertEqual(counts['categories'], {self.dal.pk: 1, self.snack.pk: 1})
+        self.assertEqual(counts['regions'], {self.hills.pk: 2})
+        self.assertEqual(counts['festivals'], {self.dashain.pk: 1, self.tihar.pk: 1})
+
+    def test_other_filters_narrow_each_facet(self):
+        counts = facet_counts(festival_id=str(self.tihar.pk))
+        self.assertEqual(counts['categories'], {self.snack.pk: 1})
+        self.assertEqual(counts['regions'], {self.hills.pk: 1})
+        # The festival facet itself ignores the festival filter
+        self.assertEqual(counts['festivals'], {self.dashain.pk: 1, self.tihar.pk: 1})
+
+        counts = facet_counts(query="rice")
+        self.assertEqual(counts['categories'], {self.dal.pk: 1})
+        self.assertEqual(counts['festivals'], {})
+
+    def test_recipe_list_ignores_junk_ids(self):
+        for param in ['category', 'region', 'festival']:
+            response = self.client.get(reverse('recipe_list'), {param: 'x'})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.context['recipes']), 2)
+
+
+class OwnProfileStampTests(TestCase):
+    def setUp(self):
+        self.chef = User.objects.create_user(username='chef', password='pw')
+        self.fan = User.objects.create_user(username='fan', password='pw')
+        self.recipe = Recipe.objects.create(title="Dal bhat", description="", created_by=self.chef)
+        self.recipe.bookmarked_by.add(self.fan)
+        self.client.login(username='fan', password='pw')
+
+    def fan_stamp(self):
+        return Profile.objects.get(user=self.fan).updated_at
+
+    def test_editing_a_bookmarked_recipe_touches_the_bookmarker(self):
+        before = self.fan_stamp()
+        self.recipe.title = "Dal bhat tarkari"
+        self.recipe.save()
+        self.assertGreater(self.fan_stamp(), before)
+
+    def test_deleting_a_bookmarked_recipe_touches_the_bookmarker(self):
+        etag = self.client.get(reverse('profile'))['ETag']
+        self.recipe.delete()
+        response = self.client.get(reverse('profile'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+calls = []
+
+
+@task(max_attempts=2)
+def remember(value):
+    calls.append(value)
+
+
+@task(max_attempts=2)
+def explode():
+    raise RuntimeError("boom")
+
+
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_duplicate_pending_key_is_dropped(self):
+        self.assertIsNotNone(remember.delay(1, key='same'))
+        self.assertIsNone(remember.delay(2, key='same'))
+        self.assertEqual(Task.objects.count(), 1)
+        run_pending()
+        self.assertEqual(calls, [1])
+        # Once that run is done the key can be queued again
+        self.assertIsNotNone(remember.delay(3, key='same'))
+
+    def test_failing_task_is_retried_then_marked_failed(self):
+        explode.delay()
+        with self.assertLogs('recipes.queue', 'ERROR'):
+            run_pending()
+        task_obj = Task.objects.get()
+        self.assertEqual((task_obj.status, task_obj.attempts), (Task.PENDING, 1))
+        self.assertGreater(task_obj.run_after, timezone.now())
+
+        Task.objects.update(run_after=timezone.now())
+        with self.assertLogs('recipes.queue', 'ERROR'):
+            run_pending()
+        task_obj.refresh_from_db()
+        self.assertEqual((task_obj.status, task_obj.attempts), (Task.FAILED, 2))
+        self.assertIn("boom", task_obj.last_error)
+
+    @override_settings(TASKS_ALWAYS_EAGER=True)
+    def test_eager_tasks_run_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertIsNone(remember.delay(1))
+            self.assertEqual(calls, [])
+        self.assertEqual(calls, [1])
+        self.assertFalse(Task.objects.exists())
+
+    def test_stale_lock_is_reclaimed(self):
+        stale = timezone.now() - STALE_LOCK_AFTER - timedelta(minutes=1)
+        for value in (1, 2):
+            Task.objects.create(name=remember.task_name, key='k', args=[value], status=Task.RUNNING, locked_at=stale)
+        Task.objects.create(name=remember.task_name, args=[3], status=Task.RUNNING, locked_at=timezone.now())
+
+        self.assertEqual(run_pending(), 1)
+        # Only the newest stale run of the key goes again; the fresh lock is left alone
+        self.assertEqual(calls, [2])
+        self.assertEqual(
+            list(Task.objects.order_by('id').values_list('status', flat=True)), [Task.DONE, Task.DONE, Task.RUNNING]
+        )
+
+    def test_prune_keeps_recent_and_pending_rows(self):
+        old = timezone.now() - KEEP_DONE - timedelta(hours=1)
+        Task.objects.create(name=remember.task_name, args=[1], status=Task.DONE)
+        Task.objects.create(name=remember.task_name, args=[2], status=Task.PENDING)
+        done = Task.objects.create(name=remember.task_name, args=[3], status=Task.DONE)
+        Task.objects.filter(pk=done.pk).update(updated_at=old)
+        self.assertEqual(prune_tasks(), 1)
+        self.assertEqual(Task.objects.count(), 2)
+
+
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        autocomplete._state['index'] = None
+        user = User.objects.create_user(username='cook')
+        self.sel_roti = Recipe.objects.create(title="Sel Roti", description="", created_by=user)
+        self.dal_bhat = Recipe.objects.create(title="Dal Bhat", description="", created_by=user)
+
+    def labels(self, text):
+        return [s['label'] for s in autocomplete.suggest(text)]
+
+    def test_typo_in_a_later_word_is_found(self):
+        self.assertIn("Sel Roti", self.labels("rotti"))
+        self.assertIn("Dal Bhat", self.labels("bhatt"))
+        self.assertIn("Sel Roti", self.labels("selrotti"))
+
+    def test_deleted_recipe_is_dropped_without_a_rebuild(self):
+        index = autocomplete.get_index()
+        self.assertIn("Dal Bhat", self.labels("dal"))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.dal_bhat.delete()
+        self.assertNotIn("Dal Bhat", self.labels("dal"))
+        self.assertIs(autocomplete.get_index(), index)
+        self.assertFalse(autocomplete._state['rebuilding'])
+
+
+def image_upload(name, fmt, size, **save_options):
+    out = io.BytesIO()
+    Image.new('RGB', size, 'orange').save(out, fmt, **save_options)
+    return SimpleUploadedFile(name, out.getvalue(), content_type='image/jpeg')
+
+
+class PrepareImageTests(SimpleTestCase):
+    def test_big_jpeg_is_downscaled_and_stripped(self):
+        exif = Image.Exif()
+        exif[0x010F] = "PhoneMaker"  # Make
+        upload = image_upload('photo.jpg', 'JPEG', (4096, 1024), exif=exif)
+        self.assertIn('exif', Image.open(upload).info)
+
+        prepared = prepare_image(upload)
+        img = Image.open(prepared)
+        self.assertEqual((img.format, img.size), ('JPEG', (MAX_DIMENSION, MAX_DIMENSION // 4)))
+        self.assertNotIn('exif', img.info)
+
+    def test_png_named_jpg_gets_png_extension(self):
+        prepared = prepare_image(image_upload('photo.jpg', 'PNG', (10, 10)))
+        self.assertEqual(prepared.name, 'photo.png')
+
+    def test_form_rejects_non_image_bytes(self):
+        upload = SimpleUploadedFile('photo.jpg', b'#!/bin/sh\necho hi\n', content_type='image/jpeg')
+        form = ProfileForm(data={'bio': '', 'experience': '', 'specialty': ''}, files={'photo': upload})
+        self.assertFalse(form.is_valid())
+        self.assertIn('photo', form.errors)
+
+
+class PageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.rendered = 0
+
+        @anonymous_page_cache()
+        def page(request):
+            self.rendered += 1
+            return HttpResponse(translation.get_language())
+        self.page = page
+
+    def get(self, user=None, message=None):
+        request = RequestFactory().get('/page/')
+        request.user = user or AnonymousUser()
+        request._messages = CookieStorage(request)
+        if message:
+            messages.info(request, message)
+        return self.page(request)
+
+    def test_second_anonymous_hit_is_served_from_cache(self):
+        self.get()
+        self.assertEqual(self.get().content, b'en')
+        self.assertEqual(self.rendered, 1)
+
+        url = reverse('chef_list')
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_pages_are_keyed_by_language(self):
+        for language in ('en', 'ne', 'en', 'ne'):
+            with translation.override(language):
+                self.assertEqual(self.get().content, language.encode())
+        self.assertEqual(self.rendered, 2)
+
+        url = reverse('chef_list')
+        for _ in range(2):  # miss, then hit
+            self.assertEqual(self.client.get(url)['Vary'], 'Cookie, Accept-Language')
+
+    def test_csrf_token_is_filled_in_per_response(self):
+        url = reverse('chef_list')
+        self.client.get(url)
+
+        visitor = self.client_class(enforce_csrf_checks=True)
+        response = visitor.get(url)
+        self.assertNotIn(CSRF_PLACEHOLDER, response.content)
+        token = CSRF_INPUT_RE.search(response.content).group(1).decode()
+        # The token on the cached page works for this visitor's cookie
+        response = visitor.post('/i18n/setlang/', {'language': 'ne', 'csrfmiddlewaretoken': token})
+        self.assertEqual(response.status_code, 302)
+
+    def test_logged_in_users_and_pending_messages_skip_the_cache(self):
+        user = User.objects.create_user(username='cook')
+        self.get(user=user)
+        self.get(user=user)
+        self.get(message="Saved")
+        self.get(message="Saved")
+        self.assertEqual(self.rendered, 4)
+        # Nothing was stored along the way
+        self.get()
+        self.assertEqual(self.rendered, 5)
+
+
+class MediaRefCountTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user(username='cook')
+
+    def upload(self, title):
+        image = SimpleUploadedFile('%s.jpg' % title, b'same bytes')
+        return Recipe.objects.create(title=title, description="", created_by=self.user, image=image)
+
+    def test_identical_uploads_share_one_blob(self):
+        first, second = self.upload("Momo"), self.upload("Sel Roti")
+        self.assertEqual(first.image.name, second.image.name)
+        blob = MediaBlob.objects.get()
+        self.assertEqual((blob.name, blob.refs, blob.size), (first.image.name, 2, len(b'same bytes')))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        blob.refresh_from_db()
+        self.assertEqual(blob.refs, 1)
+        self.assertTrue(media_storage().exists(blob.name))
+
+    def test_purge_waits_for_the_grace_period(self):
+        recipe = self.upload("Momo")
+        name = recipe.image.name
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.delete()
+        # Just stored, so the purge after the delete left it alone
+        self.assertEqual(MediaBlob.objects.get(name=name).refs, 0)
+        self.assertTrue(media_storage().exists(name))
+
+        stored_at = time.time() - PURGE_GRACE_SECONDS - 1
+        os.utime(media_storage().path(name), (stored_at, stored_at))
+        self.assertEqual(purge_unreferenced_media(), 1)
+        self.assertFalse(media_storage().exists(name))
+        self.assertFalse(MediaBlob.objects.exists())
+
+
+class CommentCounterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='cook')
+        self.recipe = Recipe.objects.create(title="Momo", description="", created_by=self.user)
+
+    def comment(self, parent=None):
+        return Comment.objects.create(recipe=self.recipe, user=self.user, text="Yum", parent=parent)
+
+    def assertCounts(self, comment_count, reply_counts):
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.comment_count, comment_count)
+        for comment, reply_count in reply_counts.items():
+            comment.refresh_from_db()
+            self.assertEqual(comment.reply_count, reply_count)
+        # The signals kept up, so a recount finds nothing to repair
+        self.assertEqual(sum(recount_counters().values()), 0)
+
+    def test_counters_follow_creates_and_deletes(self):
+        first, second = self.comment(), self.comment()
+        replies = [self.comment(parent=first) for _ in range(3)]
+        self.assertCounts(5, {first: 3, second: 0})
+
+        replies[0].delete()
+        self.assertCounts(4, {first: 2})
+
+        # Takes its two remaining replies with it
+        first.delete()
+        self.assertCounts(1, {second: 0})
+
+    def test_recount_command_repairs_drift(self):
+        parent = self.comment()
+        self.comment(parent=parent)
+        Recipe.objects.update(comment_count=9)
+        Comment.objects.update(reply_count=9)
+
+        out = io.StringIO()
+        call_command('recount_counters', stdout=out)
+        self.assertIn("Recipe.comment_count: 1 row(s) fixed", out.getvalue())
+        self.assertIn("Comment.reply_count: 2 row(s) fixed", out.getvalue())
+        self.assertCounts(2, {parent: 1})
+
+
+class FollowTests(TestCase):
+    def setUp(self):
+        self.chef, self.other_chef = [User.objects.create_user(username=n, password='pw') for n in ('chef', 'chef2')]
+        self.fans = [User.objects.create_user(username='fan%d' % i) for i in range(3)]
+
+    def counts(self, user):
+        profile = Profile.objects.get(user=user)
+        return profile.follower_count, profile.following_count
+
+    def test_counters_follow_add_remove_and_clear(self):
+        self.chef.profile.followers.add(*self.fans)
+        self.fans[0].following.add(self.other_chef.profile)
+        self.assertEqual(self.counts(self.chef), (3, 0))
+        self.assertEqual(self.counts(self.other_chef), (1, 0))
+        self.assertEqual(self.counts(self.fans[0]), (0, 2))
+
+        self.chef.profile.followers.remove(self.fans[1])
+        self.assertEqual(self.counts(self.chef), (2, 0))
+        self.assertEqual(self.counts(self.fans[1]), (0, 0))
+
+        self.fans[0].following.clear()
+        self.assertEqual(self.counts(self.chef), (1, 0))
+        self.assertEqual(self.counts(self.other_chef), (0, 0))
+        self.assertEqual(self.counts(self.fans[0]), (0, 0))
+
+        self.chef.profile.followers.clear()
+        self.assertEqual(self.counts(self.chef), (0, 0))
+        self.assertEqual(self.counts(self.fans[2]), (0, 0))
+        self.assertEqual(sum(recount_counters().values()), 0)
+
+    def test_followers_are_paged_by_cursor(self):
+        self.chef.profile.followers.add(*self.fans)
+        first, cursor = followers_page(self.chef.profile, size=2)
+        rest, last_cursor = followers_page(self.chef.profile, cursor, size=2)
+        self.assertEqual(len(first), 2)
+        self.assertIsNone(last_cursor)
+        self.assertCountEqual(first + rest, self.fans)
+
+    def test_bad_cursor_is_a_400(self):
+        self.client.login(username='chef', password='pw')
+        for name in ('followers_list', 'following_list'):
+            response = self.client.get(reverse(name, args=['chef']), {'cursor': 'abc'})
+            self.assertEqual(response.status_code, 400)
+
+
+class TrendingTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='cook')
+        self.momo, self.dal = [
+            Recipe.objects.create(title=title, description="", created_by=user) for title in ("Momo", "Dal")
+        ]
+
+    def like(self, recipe, times):
+        record_events(InteractionEvent.LIKE, [recipe.pk] * times)
+
+    def ranking(self):
+        return list(TrendingRecipe.objects.values_list('recipe_id', flat=True))
+
+    def test_page_version_only_moves_when_the_order_does(self):
+        self.like(self.momo, 3)
+        self.like(self.dal, 1)
+        version = page_version()
+        refresh_trending()
+        self.assertEqual(self.ranking(), [self.momo.pk, self.dal.pk])
+        self.assertNotEqual(page_version(), version)
+
+        # New scores, same order: the cached home pages stay
+        self.like(self.momo, 2)
+        version = page_version()
+        refresh_trending()
+        self.assertEqual(page_version(), version)
+
+        self.like(self.dal, 10)
+        refresh_trending()
+        self.assertEqual(self.ranking(), [self.dal.pk, self.momo.pk])
+        self.assertNotEqual(page_version(), version)
+
+    def test_scores_halve_every_half_life(self):
+        now = timezone.now()
+        InteractionEvent.objects.create(recipe=self.momo, kind=InteractionEvent.LIKE, created_at=now)
+        InteractionEvent.objects.create(recipe=self.dal, kind=InteractionEvent.LIKE, created_at=now - HALF_LIFE)
+        scores = decayed_scores(now)
+        self.assertAlmostEqual(scores[self.dal.pk] / scores[self.momo.pk], 0.5, delta=0.02)
+
+
+class ViewCountTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='cook')
+        self.recipe = Recipe.objects.create(title="Momo", description="", created_by=user)
+        with viewcounts._lock:
+            viewcounts._buffer.clear()
+            viewcounts._last_flush = time.monotonic()
+        self.addCleanup(self.stop_timer)
+
+    def stop_timer(self):
+        with viewcounts._lock:
+            timer, viewcounts._timer = viewcounts._timer, None
+        if timer:
+            timer.cancel()
+
+    def test_views_are_written_a_batch_at_a_time(self):
+        for _ in range(viewcounts.FLUSH_SIZE - 1):
+            viewcounts.record_view(self.recipe.pk)
+        self.assertFalse(RecipeView.objects.exists())
+        # Writes the tail if no further view comes along
+        self.assertIsNotNone(viewcounts._timer)
+
+        viewcounts.record_view(self.recipe.pk)
+        self.assertEqual(RecipeView.objects.count(), viewcounts.FLUSH_SIZE)
+        self.assertEqual(viewcounts.flush_views(), 0)
+
+    def test_flushed_views_roll_up_into_daily_counts(self):
+        for _ in range(3):
+            self.client.get(reverse('recipe_detail', args=[self.recipe.pk]))
+        self.assertEqual(viewcounts.flush_views(), 3)
+
+        self.assertEqual(viewcounts.rollup_views(), (1, 0))
+        # Running it again changes nothing
+        self.assertEqual(viewcounts.rollup_views(), (1, 0))
+        daily = RecipeViewDaily.objects.get()
+        self.assertEqual((daily.recipe_id, daily.day, daily.views), (self.recipe.pk, timezone.localdate(), 3))
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(username='staff', password='pw', is_staff=True)
+        User.objects.create_user(username='cook', password='pw')
+        self.recipes = [
+            Recipe.objects.create(title="Recipe %d" % i, description="", created_by=self.staff) for i in range(5)
+        ]
+        Ingredient.objects.create(recipe=self.recipes[0], name="rice", quantity="2 cups")
+
+    def export(self, **params):
+        response = self.client.get(reverse('export_recipes'), params)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_only_staff_can_export(self):
+        self.client.login(username='cook', password='pw')
+        self.assertEqual(self.client.get(reverse('export_recipes')).status_code, 403)
+
+    def test_every_row_is_streamed(self):
+        self.client.login(username='staff', password='pw')
+        rows = list(csv.DictReader(io.StringIO(self.export().decode())))
+        self.assertEqual([int(row['id']) for row in rows], [r.pk for r in self.recipes])
+        self.assertEqual(rows[0]['ingredients'], "2 cups rice")
+
+        lines = gzip.decompress(self.export(format='jsonl', gzip='1')).decode().splitlines()
+        self.assertEqual([json.loads(line)['title'] for line in lines], [r.title for r in self.recipes])
+
+    def test_rows_span_chunks(self):
+        rows = list(export_rows(chunk_size=2))
+        self.assertEqual([row['id'] for row in rows], [r.pk for r in self.recipes])
+        self.assertEqual(rows[0]['ingredients'][0]['name'], "rice")
@@ -0,0 +1,88 @@
+import math
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from .models import InteractionEvent, TrendingRecipe
+from .pagecache import bump_page_version
+
+# -------------------------------
+# Trending recipes
+# -------------------------------
+# Likes, bookmarks, downloads and comments are logged as InteractionEvents
+# (signals.py, download_recipe_pdf). refresh_trending() runs periodically
+# (tasks.refresh_trending or `manage.py refresh_trending`): it counts the
+# window's events per recipe, kind and hour in the database, decays each
+# hourly bucket exponentially by its age, and rewrites the small
+# TrendingRecipe table, which the home page reads by rank.
+
+HALF_LIFE = timedelta(days=2)
+# Events older than this weigh under 10% and are deleted
+WINDOW = timedelta(days=7)
+TRENDING_SIZE = 50
+# How many the home page shows; its cached copies only go stale when these move
+TRENDING_ON_HOME = 5
+# How often the background task recomputes the table
+REFRESH_INTERVAL = timedelta(minutes=15)
+
+WEIGHTS = {
+    InteractionEvent.LIKE: 3.0,
+    InteractionEvent.BOOKMARK: 4.0,
+    InteractionEvent.COMMENT: 2.0,
+    InteractionEvent.DOWNLOAD: 1.0,
+}
+
+
+def record_events(kind, recipe_ids, user_id=None):
+    InteractionEvent.objects.bulk_create(
+        [InteractionEvent(recipe_id=recipe_id, user_id=user_id, kind=kind) for recipe_id in recipe_ids]
+    )
+
+
+def decayed_scores(now=None):
+    """{recipe_id: score} over the window, each event worth weight * 2^(-age / HALF_LIFE)."""
+    now = now or timezone.now()
+    buckets = (
+        InteractionEvent.objects.filter(created_at__gte=now - WINDOW)
+        .annotate(hour=TruncHour('created_at'))
+        .values_list('recipe_id', 'kind', 'hour')
+        .annotate(n=Count('*'))
+        .order_by()
+    )
+    half_life = HALF_LIFE.total_seconds()
+    scores = defaultdict(float)
+    for recipe_id, kind, hour, n in buckets.iterator():
+        # Bucket midpoint; a fresh bucket does not count as future
+        age = max((now - hour).total_seconds() - 1800, 0)
+        scores[recipe_id] += n * WEIGHTS.get(kind, 0) * math.pow(2, -age / half_life)
+    return scores
+
+
+def refresh_trending(now=None):
+    """Rewrite TrendingRecipe from the event log; returns the number of rows."""
+    now = now or timezone.now()
+    scores = decayed_scores(now)
+    top = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:TRENDING_SIZE]
+    shown = list(TrendingRecipe.objects.order_by('rank').values_list('recipe_id', flat=True)[:TRENDING_ON_HOME])
+
+    with transaction.atomic():
+        TrendingRecipe.objects.all().delete()
+        TrendingRecipe.objects.bulk_create([
+            TrendingRecipe(recipe_id=recipe_id, rank=rank, score=score, computed_at=now)
+            for rank, (recipe_id, score) in enumerate(top, start=1)
+        ])
+        InteractionEvent.objects.filter(created_at__lt=now - WINDOW).delete()
+    # Scores drift every run; the cached home pages only care about the order shown
+    if [recipe_id for recipe_id, _ in top[:TRENDING_ON_HOME]] != shown:
+        bump_page_version()
+    return len(top)
+
+
+def trending_recipes(limit):
+    """The top `limit` recipes: a short range scan of a table of TRENDING_SIZE rows."""
+    rows = TrendingRecipe.objects.select_related('recipe__category').order_by('rank')[:limit]
+    return [row.recipe for row in rows]
@@ -1,7 +1,7 @@
 # recipes/urls.py
 
 from django.urls import path
-from . import views
+from . import views, api
 from django.contrib.auth import views as auth_views
 from .views import register, chef_list
 
@@ -28,7 +28,13 @@ urlpatterns = [
     
     path('recipe/<int:pk>/add_comment/', views.add_comment_ajax, name='add_comment_ajax'),
 
+    path('recipe/<int:pk>/comments/', views.recipe_comments, name='recipe_comments'),
+
+    path('comment/<int:pk>/replies/', views.comment_replies, name='comment_replies'),
+
     path('recipe/<int:pk>/download/', views.download_recipe_pdf, name='download_recipe_pdf'),
+
+    path('export/recipes/', views.export_recipes, name='export_recipes'),
     
     # path('chef/<int:chef_id>/', views.chef_profile, name='chef_profile'),
 
@@ -57,5 +63,13 @@ urlpatterns = [
     
     path('user/<int:user_id>/', views.user_profile, name='user_profile'),
 
+    path('api/recipes/', api.recipe_cards, name='api_recipe_cards'),
+
+    path('api/state/', api.interaction_state, name='api_interaction_state'),
+
+    path('api/interactions/', api.batch_interactions, name='api_batch_interactions'),
+
+    path('api/autocomplete/', api.autocomplete, name='api_autocomplete'),
+
 ]
 
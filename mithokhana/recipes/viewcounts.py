@@ -0,0 +1,137 @@
+import atexit
+import threading
+import time
+from datetime import timedelta
+from functools import wraps
+
+from django.db import connections, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Recipe, RecipeView, RecipeViewDaily
+
+# -------------------------------
+# Recipe view counting
+# -------------------------------
+# Views are buffered in process and written with one bulk INSERT per
+# FLUSH_SIZE views (or FLUSH_INTERVAL seconds, by a timer thread when no
+# further view comes along) into the append-only RecipeView table.
+# tasks.rollup_views (or `manage.py rollup_views`) folds them into
+# per-recipe daily counts (RecipeViewDaily) and prunes raw rows older than
+# RAW_RETENTION_DAYS; profile pages only ever read the daily table.
+
+FLUSH_SIZE = 100
+FLUSH_INTERVAL = 10  # seconds
+RAW_RETENTION_DAYS = 3
+# How often the background task rolls views up
+ROLLUP_INTERVAL = timedelta(hours=1)
+
+_buffer = []
+_lock = threading.Lock()
+_last_flush = time.monotonic()
+_timer = None
+
+
+def record_view(recipe_id):
+    global _timer
+    with _lock:
+        _buffer.append(RecipeView(recipe_id=recipe_id, viewed_at=timezone.now()))
+        due = len(_buffer) >= FLUSH_SIZE or time.monotonic() - _last_flush >= FLUSH_INTERVAL
+        if not due and _timer is None:
+            # The last views before traffic stops would otherwise wait for the next one
+            _timer = threading.Timer(FLUSH_INTERVAL, _timed_flush)
+            _timer.daemon = True
+            _timer.start()
+    if due:
+        flush_views()
+
+
+def _timed_flush():
+    global _timer
+    with _lock:
+        _timer = None
+    try:
+        flush_views()
+    finally:
+        # Connections are per thread; don't leave this one open
+        connections.close_all()
+
+
+def flush_views():
+    """Write the buffered views; returns how many were written."""
+    global _buffer, _last_flush
+    with _lock:
+        batch, _buffer = _buffer, []
+        _last_flush = time.monotonic()
+    if batch:
+        RecipeView.objects.bulk_create(batch, batch_size=500)
+    return len(batch)
+
+
+# Don't lose the tail of the buffer when a worker shuts down cleanly
+atexit.register(flush_views)
+
+
+def count_views(view):
+    """Count successful GETs of a recipe page, including 304s and cached pages."""
+    @wraps(view)
+    def wrapper(request, pk, *args, **kwargs):
+        response = view(request, pk, *args, **kwargs)
+        if request.method == 'GET' and response.status_code in (200, 304):
+            record_view(pk)
+        return response
+    return wrapper
+
+# -------------------------------
+# Daily rollup
+# -------------------------------
+
+def rollup_views(now=None):
+    """
+    Recount RecipeViewDaily for every day still held in raw form, then prune
+    raw views from before the retention cutoff. Pruning drops whole days, so
+    each day left in RecipeView is complete and its count can simply be
+    replaced; running it twice changes nothing.
+    Chefs whose counts changed get their profiles touched, so the view
+    stats on their own profile page aren't answered with a stale 304.
+    Returns (daily rows written, raw rows pruned).
+    """
+    from .signals import touch_profiles
+    now = now or timezone.now()
+    cutoff = timezone.localtime(now).replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(
+        days=RAW_RETENTION_DAYS
+    )
+    counts = list(
+        # Views of since-deleted recipes are dropped (RecipeView has no FK constraint)
+        RecipeView.objects.filter(recipe_id__in=Recipe.objects.values('pk'))
+        .annotate(day=TruncDate('viewed_at'))
+        .values_list('recipe_id', 'day')
+        .annotate(n=Count('*'))
+        .order_by()
+    )
+    days = {day for _, day, _ in counts}
+    before = set(RecipeViewDaily.objects.filter(day__in=days).values_list('recipe_id', 'day', 'views'))
+    changed = {recipe_id for recipe_id, _, _ in before.symmetric_difference(counts)}
+    with transaction.atomic():
+        RecipeViewDaily.objects.filter(day__in=days).delete()
+        RecipeViewDaily.objects.bulk_create(
+            [RecipeViewDaily(recipe_id=recipe_id, day=day, views=n) for recipe_id, day, n in counts], batch_size=500
+        )
+        pruned, _ = RecipeView.objects.filter(viewed_at__lt=cutoff).delete()
+        # Only chefs see view stats (profiles.profile_page_context)
+        chefs = Recipe.objects.filter(pk__in=changed, created_by__profile__is_chef=True).values_list('created_by_id', flat=True)
+        touch_profiles(user_ids=set(chefs))
+    return len(counts), pruned
+
+
+def chef_view_stats(user, days=30):
+    """Daily view totals over all of a user's recipes, plus per-recipe totals, for the last `days` days."""
+    since = timezone.localdate() - timedelta(days=days - 1)
+    rows = RecipeViewDaily.objects.filter(recipe__created_by=user, day__gte=since)
+    by_day = dict(rows.values_list('day').annotate(total=Sum('views')).order_by())
+    series = [(since + timedelta(days=i), by_day.get(since + timedelta(days=i), 0)) for i in range(days)]
+    top = list(
+        rows.values('recipe_id', 'recipe__title').annotate(total=Sum('views')).order_by('-total', 'recipe_id')[:10]
+    )
+    return {'series': series, 'peak': max([n for _, n in series] + [1]), 'top': top, 'total': sum(by_day.values())}
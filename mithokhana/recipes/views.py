@@ -1,44 +1,77 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse, JsonResponse, HttpResponseForbidden
-from django.views.decorators.http import require_POST
+from django.http import HttpResponse, JsonResponse, HttpResponseBadRequest, HttpResponseForbidden, FileResponse, StreamingHttpResponse
+from django.views.decorators.http import require_POST, condition
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.utils.text import slugify
 from django.conf import settings
-from django.db.models import Count, Q
+from django.db.models import Count, Q, F
+from django.core.files.storage import default_storage
 from django.utils import timezone
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.utils import ImageReader
-from textwrap import wrap
-import random
 import calendar
 from pathlib import Path
 from django.contrib.auth import login
 
-from .models import Recipe, Category, Region, Comment, Festival, Ingredient, Profile
-import qrcode
-import io
+from .models import Recipe, Category, Region, Comment, Festival, Ingredient, Profile, InteractionEvent
 from .forms import UserRegisterForm, ProfileForm, EditProfileForm
+from .facets import facet_counts, search_recipes
+from .pantry import pantry_rank
+from .autocomplete import record_search
+from .conditional import (
+    recipe_etag, recipe_stamp, own_profile_etag, own_profile_stamp,
+    profile_etag, profile_stamp, user_profile_etag, user_profile_stamp,
+)
+from .interactions import liked_ids, bookmarked_ids, following_ids, like_count_annotation
+from .comments import top_level_page, replies_page, serialize_comment
+from .pdf import build_recipe_pdf, cached_pdf_name
+from .tasks import render_recipe_pdf, process_recipe
+from .paginator import EstimatedCountPaginator
+from .pagecache import anonymous_page_cache
+from .images import prepare_image
+from .profiles import profile_page_context
+from .trending import TRENDING_ON_HOME, trending_recipes, record_events
+from .viewcounts import count_views
+from .lookups import categories, regions, festivals, get_row, form_choices
+from .export import FORMATS as EXPORT_FORMATS, export_stream
+from .follows import followers_page, following_page, mark_followed
+from django.core.exceptions import ValidationError
 from django.utils.translation import gettext as _
 from django.contrib.auth.models import User 
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 
 
+RECIPES_PER_PAGE = 12
 
+
+def _record_cached_search(request):
+    # Searches that found nothing flash a message, and such pages are never cached
+    query = request.GET.get('q', '').strip()
+    if query and not request.GET.get('have', '').strip() and not request.GET.get('page'):
+        record_search(query)
+
+
+def _id_param(request, name):
+    # Junk like ?festival=x is ignored instead of reaching the ORM
+    value = request.GET.get(name, '').strip()
+    return str(int(value)) if value.isascii() and value.isdigit() else ''
+
+
+@anonymous_page_cache(on_hit=_record_cached_search)
 def recipe_list(request):
     query = request.GET.get('q', '').strip()
-    category_id = request.GET.get('category', '')
-    region_id = request.GET.get('region', '')
-    festival_id = request.GET.get('festival', '')
+    category_id = _id_param(request, 'category')
+    region_id = _id_param(request, 'region')
+    festival_id = _id_param(request, 'festival')
+    pantry = request.GET.get('have', '').strip()
    
     #  Start with all recipes
-    recipes = Recipe.objects.all()
+    recipes = Recipe.objects.select_related('category', 'region', 'created_by__profile').annotate(
+        like_count=like_count_annotation()
+    )
     
     # Filter by title/description for basic search
-    if query:
-        recipes = recipes.filter(title__icontains=query) | recipes.filter(description__icontains=query)
+    recipes = search_recipes(recipes, query)
         
     # Apply filters
     if category_id:
@@ -46,11 +79,16 @@ def recipe_list(request):
     if region_id:
         recipes = recipes.filter(region__id=region_id)
     if festival_id:
-        recipes = recipes.filter(festivals__id=festival_id)
-        
+        recipes = recipes.filter(festival_set__id=festival_id)
+
+    # ✅ "Cook with what I have": rank by how much of each recipe the pantry covers
+    if pantry:
+        recipes = pantry_rank(recipes, pantry)
+        if not recipes.exists():
+            messages.warning(request, "No recipes use the ingredients you have.")
         
-     # TF-IDF Ranking (only if query and recipes found)
-    if query and recipes.exists():
+     # TF-IDF Ranking (only if query and recipes found; pantry ranking wins otherwise)
+    if query and not pantry and recipes.exists():
         corpus = [f"{r.title} {r.description}" for r in recipes]
 
         if corpus and any(len(doc.strip()) > 0 for doc in corpus):
@@ -65,25 +103,34 @@ def recipe_list(request):
 
                 if not recipes:
                     messages.warning(request, "No relevant recipes found for your search.")
+                elif not request.GET.get('page'):
+                    # ✅ Searches that found something feed autocomplete ranking
+                    record_search(query)
             except ValueError:
                 recipes = []
                 messages.warning(request, "Search input is too generic or invalid.")
         else:
             recipes = []
             messages.warning(request, "No searchable content available in recipes.")
-    elif query and not recipes.exists():
+    elif query and not pantry and not recipes.exists():
         messages.warning(request, "No recipes match your search or filters.")
 
-    # static data
-    categories = Category.objects.all()
-    regions = Region.objects.all()
-    festivals = Festival.objects.all()
+    if not isinstance(recipes, list) and not pantry:
+        recipes = recipes.order_by('-created_at', '-id')
+    page_obj = EstimatedCountPaginator(recipes, RECIPES_PER_PAGE).get_page(request.GET.get('page'))
 
-    popular_recipes = list(
-        Recipe.objects.annotate(like_count=Count('likes')).order_by('-like_count')[:10]
-    )
-    random.shuffle(popular_recipes)
-    popular_recipes = popular_recipes[:3]
+    # static data, paired with facet counts for the current search/filters
+    counts = facet_counts(query, category_id, region_id, festival_id)
+    category_rows = [(c, counts['categories'].get(c.id, 0)) for c in categories()]
+    region_rows = [(r, counts['regions'].get(r.id, 0)) for r in regions()]
+    festival_rows = [(f, counts['festivals'].get(f.id, 0)) for f in festivals()]
+
+    # ✅ Trending this week: read from the table refresh_trending() maintains
+    popular_recipes = trending_recipes(TRENDING_ON_HOME)
+    is_trending = bool(popular_recipes)
+    if not is_trending:
+        # Nothing ranked yet (fresh install): show the newest instead
+        popular_recipes = list(Recipe.objects.select_related('category').order_by('-created_at', '-id')[:TRENDING_ON_HOME])
 
     # Exclude logged-in user if authenticated
     if request.user.is_authenticated:
@@ -93,16 +140,20 @@ def recipe_list(request):
     
     
     return render(request, 'recipes/recipe_list.html', {
-        'recipes': recipes,
+        'recipes': page_obj.object_list,
+        'page_obj': page_obj,
         'query': query,
-        'categories': categories,
-        'regions': regions,
-        'festivals': festivals,
+        'pantry': pantry,
+        'categories': category_rows,
+        'regions': region_rows,
+        'festivals': festival_rows,
         'selected_category': category_id,
         'selected_region': region_id,
         'selected_festival': festival_id,
         'popular_recipes': popular_recipes,
+        'is_trending': is_trending,
         'users': users,
+        'liked_ids': liked_ids(request.user),
     })
 
 
@@ -117,25 +168,23 @@ def upload_recipe(request):
         video = request.FILES.get('video')
         festival_ids = request.POST.getlist('festivals')
 
-        # Check if category and region selected
-        if not category_id or not region_id:
+        # ✅ Ids are checked against the in-memory lookup tables, not the database
+        category = get_row(Category, category_id)
+        region = get_row(Region, region_id)
+        if category is None or region is None:
             return render(request, 'recipes/upload_recipe.html', {
-                'categories': Category.objects.all(),
-                'regions': Region.objects.all(),
-                'festivals': Festival.objects.all(),
+                **form_choices(),
                 'error': "Please select both a category and a region."
             })
 
-        # ✅ Validate image file type
+        # ✅ Validate image by its content (not the client's content type), downscale big ones
         if image:
-            image_type = image.content_type
-            image_ext = Path(image.name).suffix.lower()
-            if image_type not in ['image/jpeg', 'image/png', 'image/gif'] or image_ext not in ['.jpg', '.jpeg', '.png', '.gif']:
+            try:
+                image = prepare_image(image)
+            except ValidationError as e:
                 return render(request, 'recipes/upload_recipe.html', {
-                    'categories': Category.objects.all(),
-                    'regions': Region.objects.all(),
-                    'festivals': Festival.objects.all(),
-                    'error': "❌ Invalid image format. Please upload JPEG, PNG, or GIF only."
+                    **form_choices(),
+                    'error': "❌ " + e.messages[0]
                 })
 
         # ✅ Validate video file type
@@ -144,15 +193,10 @@ def upload_recipe(request):
             video_ext = Path(video.name).suffix.lower()
             if video_type not in ['video/mp4', 'video/webm', 'video/ogg'] or video_ext not in ['.mp4', '.webm', '.ogg']:
                 return render(request, 'recipes/upload_recipe.html', {
-                    'categories': Category.objects.all(),
-                    'regions': Region.objects.all(),
-                    'festivals': Festival.objects.all(),
+                    **form_choices(),
                     'error': "❌ Invalid video format. Please upload MP4, WebM, or OGG only."
                 })
 
-        category = Category.objects.get(id=category_id)
-        region = Region.objects.get(id=region_id)
-
         # ✅ Create Recipe
         recipe = Recipe.objects.create(
             title=title,
@@ -164,8 +208,9 @@ def upload_recipe(request):
             created_by=request.user
         )
 
-        if festival_ids:
-            recipe.festivals.set(festival_ids)
+        chosen_festivals = [f for f in (get_row(Festival, pk) for pk in festival_ids) if f is not None]
+        if chosen_festivals:
+            recipe.festival_set.set(chosen_festivals)
 
         # ✅ Add Ingredients
         names = request.POST.getlist('ingredient_name')
@@ -181,20 +226,23 @@ def upload_recipe(request):
                     cook_time=time.strip()
                 )
 
+        # ✅ Heavy post-save work runs in the background worker
+        process_recipe.delay(recipe.pk, key=f"process:{recipe.pk}")
+
         messages.success(request, _("✅ Recipe uploaded successfully!"))
         return redirect('recipe_detail', pk=recipe.pk)
 
     # GET request — show form
-    return render(request, 'recipes/upload_recipe.html', {
-        'categories': Category.objects.all(),
-        'regions': Region.objects.all(),
-        'festivals': Festival.objects.all()
-    })
+    return render(request, 'recipes/upload_recipe.html', form_choices())
 
 
+@count_views
+@condition(etag_func=recipe_etag, last_modified_func=recipe_stamp)
+@anonymous_page_cache(stamp_func=recipe_stamp)
 def recipe_detail(request, pk):
     recipe = get_object_or_404(Recipe, pk=pk)
-    comments = recipe.comments.filter(parent=None).order_by('-created_at')
+    # First page only; the rest is loaded by recipe_comments/comment_replies
+    comments, next_cursor = top_level_page(recipe)
 
     if request.method == 'POST':
         text = request.POST.get('text')
@@ -208,7 +256,11 @@ def recipe_detail(request, pk):
     return render(request, 'recipes/recipe_detail.html', {
         'recipe': recipe,
         'comments': comments,
+        'next_cursor': next_cursor,
         'user': request.user,
+        'likes_count': recipe.likes.count(),
+        'is_liked': recipe.pk in liked_ids(request.user),
+        'is_bookmarked': recipe.pk in bookmarked_ids(request.user),
     })
 
 
@@ -222,11 +274,20 @@ def edit_recipe(request, pk):
     if request.method == 'POST':
         recipe.title = request.POST.get('title')
         recipe.description = request.POST.get('description')
-        recipe.category = Category.objects.get(id=request.POST.get('category'))
-        recipe.region = Region.objects.get(id=request.POST.get('region'))
+        category = get_row(Category, request.POST.get('category'))
+        region = get_row(Region, request.POST.get('region'))
+        if category is None or region is None:
+            messages.error(request, "Please select both a category and a region.")
+            return redirect('edit_recipe', pk=pk)
+        recipe.category = category
+        recipe.region = region
 
         if 'image' in request.FILES:
-            recipe.image = request.FILES['image']
+            try:
+                recipe.image = prepare_image(request.FILES['image'])
+            except ValidationError as e:
+                messages.error(request, "❌ " + e.messages[0])
+                return redirect('edit_recipe', pk=pk)
         if 'video' in request.FILES:
             recipe.video = request.FILES['video']
 
@@ -251,13 +312,15 @@ def edit_recipe(request, pk):
                     note=note
                 )
 
+        process_recipe.delay(recipe.pk, key=f"process:{recipe.pk}")
+
         messages.success(request, _("✅ Recipe updated successfully!"))
         return redirect('recipe_detail', pk=pk)
 
     return render(request, 'recipes/edit_recipe.html', {
         'recipe': recipe,
-        'categories': Category.objects.all(),
-        'regions': Region.objects.all(),
+        'categories': categories(),
+        'regions': regions(),
     })
 
 @login_required
@@ -288,7 +351,7 @@ def ajax_delete_comment(request, pk):
 @login_required
 def toggle_like(request, pk):
     recipe = get_object_or_404(Recipe, pk=pk)
-    if request.user in recipe.likes.all():
+    if recipe.pk in liked_ids(request.user):
         recipe.likes.remove(request.user)
         liked = False
     else:
@@ -301,7 +364,7 @@ def toggle_like(request, pk):
 @login_required
 def toggle_bookmark(request, pk):
     recipe = get_object_or_404(Recipe, pk=pk)
-    if request.user in recipe.bookmarked_by.all():
+    if recipe.pk in bookmarked_ids(request.user):
         recipe.bookmarked_by.remove(request.user)
         bookmarked = False
     else:
@@ -311,28 +374,15 @@ def toggle_bookmark(request, pk):
 
 
 @login_required
+@condition(etag_func=own_profile_etag, last_modified_func=own_profile_stamp)
 def profile(request):
-    user = request.user
-    profile = user.profile  # Access profile via OneToOneField
-
-    bookmarked = user.bookmarked_recipes.all()
-    my_recipes = Recipe.objects.filter(created_by=user)
-    
-    context = {
-        'user': user,
-        'profile': profile,
-        'bookmarked': bookmarked,
-        'my_recipes': my_recipes,
-        'is_own_profile': True,
-        'is_following': False,
-        'followers_count': profile.total_followers(),
-        'following_count': profile.total_following(),
-    }
-
+    # ✅ request.user carries its profile (recipes.auth), stats come from the cache
+    context = profile_page_context(request, request.user.profile)
     return render(request, 'recipes/profile.html', context)
 
 
 
+@anonymous_page_cache()
 def festival_calendar(request):
     month = request.GET.get('month')
     festivals = Festival.objects.all()
@@ -375,105 +425,77 @@ def add_comment_ajax(request, pk):
     return JsonResponse({'error': 'Text is required'}, status=400)
 
 
+@condition(etag_func=recipe_etag)
+def recipe_comments(request, pk):
+    recipe = get_object_or_404(Recipe, pk=pk)
+    try:
+        comments, next_cursor = top_level_page(recipe, request.GET.get('cursor'))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+
+    return JsonResponse({
+        'comments': [serialize_comment(c, request.user) for c in comments],
+        'next_cursor': next_cursor,
+        'comment_count': recipe.comment_count,
+    })
+
+
+def comment_replies(request, pk):
+    comment = get_object_or_404(Comment, pk=pk)
+    try:
+        replies, next_cursor = replies_page(comment, request.GET.get('cursor'))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+
+    return JsonResponse({
+        'replies': [serialize_comment(r, request.user) for r in replies],
+        'next_cursor': next_cursor,
+        'reply_count': comment.reply_count,
+    })
+
+
 
 @login_required
 def download_recipe_pdf(request, pk):
-    recipe = get_object_or_404(Recipe, pk=pk)
+    recipe = get_object_or_404(Recipe.objects.select_related('category', 'region', 'created_by'), pk=pk)
 
-    # ✅ Increment download count
-    recipe.download_count += 1
-    recipe.save(update_fields=['download_count'])
+    # ✅ Increment download count (queryset update: no race, no save() signals)
+    Recipe.objects.filter(pk=pk).update(download_count=F('download_count') + 1)
+    record_events(InteractionEvent.DOWNLOAD, [pk], request.user.pk)
 
     # ✅ Prepare response with a safe filename
     filename = f"{slugify(recipe.title)}.pdf"
+
+    # ✅ Serve the pre-rendered file when the background task already made it
+    name = cached_pdf_name(recipe)
+    if default_storage.exists(name):
+        return FileResponse(default_storage.open(name), as_attachment=True, filename=filename,
+                            content_type='application/pdf')
+
+    render_recipe_pdf.delay(recipe.pk, key=f"pdf:{recipe.pk}")
+
     response = HttpResponse(content_type='application/pdf')
     response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    build_recipe_pdf(recipe, response)
+    return response
 
-    # ✅ Initialize canvas
-    p = canvas.Canvas(response, pagesize=A4)
-    width, height = A4
-    y = height - 50
-
-    # ✅ Title
-    p.setFont("Helvetica-Bold", 18)
-    p.drawString(50, y, f"🍽 {recipe.title}")
-    y -= 30
-
-    # ✅ Metadata
-    p.setFont("Helvetica", 12)
-    p.drawString(50, y, f"Category: {recipe.category.name if recipe.category else 'N/A'}")
-    y -= 20
-    p.drawString(50, y, f"Region: {recipe.region.name if recipe.region else 'N/A'}")
-    y -= 20
-    p.drawString(50, y, f"Cook Time: {recipe.cook_time} minutes")
-    y -= 20
-    p.drawString(50, y, f"Uploaded by: {recipe.created_by.username}")
-    y -= 30
-
-    # ✅ Image (if exists)
-    if recipe.image:
-        try:
-            img = ImageReader(recipe.image.path)
-            p.drawImage(img, 50, y - 200, width=200, height=150, preserveAspectRatio=True)
-            y -= 220
-        except Exception as e:
-            p.setFont("Helvetica-Oblique", 10)
-            p.drawString(50, y, f"(Image failed to load: {str(e)})")
-            y -= 20
-
-    # ✅ Ingredients
-    ingredients = recipe.ingredients.all()
-    if ingredients:
-        p.setFont("Helvetica-Bold", 13)
-        p.drawString(50, y, "🧂 Ingredients:")
-        y -= 20
-        p.setFont("Helvetica", 11)
-        for ing in ingredients:
-            line = f"- {ing.quantity} {ing.name}".strip()
-            p.drawString(60, y, line)
-            y -= 15
-            if y < 100:
-                p.showPage()
-                y = height - 50
-                p.setFont("Helvetica", 11)
-
-
-    # ✅ Description
-    y -= 10
-    p.setFont("Helvetica-Bold", 13)
-    p.drawString(50, y, "📖 Description:")
-    y -= 20
-    p.setFont("Helvetica", 11)
-    desc_lines = wrap(recipe.description or "", 90)
-    for line in desc_lines:
-        p.drawString(50, y, line)
-        y -= 15
-        if y < 100:
-            p.showPage()
-            y = height - 50
-            p.setFont("Helvetica", 11)
-
-    # ✅ QR Code linking to the online recipe
-    p.setFont("Helvetica-Bold", 12)
-    p.drawString(50, y, "🔗 View this recipe online:")
-    y -= 20
-    recipe_url = f"{settings.SITE_DOMAIN}/recipe/{recipe.pk}/"  # SITE_DOMAIN must be defined in settings
-
-    qr = qrcode.make(recipe_url)
-    qr_io = io.BytesIO()
-    qr.save(qr_io, format='PNG')
-    qr_io.seek(0)
-    qr_image = ImageReader(qr_io)
-    p.drawImage(qr_image, 50, y - 100, width=100, height=100)
-    y -= 120
-
-    # ✅ Footer
-    p.setFont("Helvetica-Oblique", 10)
-    p.drawString(50, 50, "Downloaded from Mitho Khana 🍛")
-
-    # ✅ Finalize and return
-    p.showPage()
-    p.save()
+@login_required
+def export_recipes(request):
+    if not request.user.is_staff:
+        return HttpResponseForbidden("Only staff can export the catalog.")
+
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return HttpResponse("Unknown format; use csv or jsonl.", status=400)
+    compress = request.GET.get('gzip') == '1'
+
+    # ✅ Rows are streamed as they are read; nothing is built up in memory
+    content_type, ext = EXPORT_FORMATS[fmt]
+    filename = f"recipes-{timezone.now():%Y%m%d}.{ext}"
+    if compress:
+        content_type, filename = 'application/gzip', filename + '.gz'
+    response = StreamingHttpResponse(export_stream(fmt, compress), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
     return response
 
 # def chef_profile(request, chef_id):
@@ -538,7 +560,7 @@ def register(request):
             # ✅ Update it with form data
             profile_data = profile_form.cleaned_data
             profile.bio = profile_data.get('bio')
-            profile.photo = request.FILES.get('photo')
+            profile.photo = profile_data.get('photo')
             profile.is_chef = profile_data.get('is_chef')
             profile.experience = profile_data.get('experience')
             profile.specialty = profile_data.get('specialty')
@@ -557,6 +579,7 @@ def register(request):
     
 from django.contrib.auth.models import User
 
+@anonymous_page_cache()
 def chef_list(request):
     chefs = User.objects.filter(profile__is_chef=True)
     return render(request, 'recipes/chef_list.html', {'chefs': chefs})
@@ -576,29 +599,14 @@ def edit_profile(request):
 
 
 @login_required
+@condition(etag_func=profile_etag, last_modified_func=profile_stamp)
 def view_profile(request, username):
-    user_obj = get_object_or_404(User, username=username)
-    profile = user_obj.profile
-    my_recipes = Recipe.objects.filter(created_by=user_obj)
-    bookmarked = request.user.bookmarked_recipes.all()
-
-    is_own_profile = (request.user == user_obj)
+    profile = get_object_or_404(Profile.objects.select_related('user'), user__username=username)
+    context = profile_page_context(request, profile)
 
-    is_following = False
-    if not is_own_profile:
-        is_following = profile.followers.filter(id=request.user.id).exists()
-
-    context = {
-        'user': user_obj,
-        'profile': profile,
-        'my_recipes': my_recipes,
-        'bookmarked': bookmarked,
-        'is_own_profile': is_own_profile,
-        'is_following': is_following,
-        'followers_count': profile.total_followers(),
-        'following_count': profile.total_following(),
-        'show_chef_badge': profile.is_chef,  # New flag for template
-    }
+    context['is_following'] = False
+    if not context['is_own_profile']:
+        context['is_following'] = profile.user_id in following_ids(request.user)
 
     return render(request, 'recipes/profile.html', context)
 
@@ -606,35 +614,43 @@ def view_profile(request, username):
 @login_required
 def follow_user(request, username):
     profile = get_object_or_404(Profile, user__username=username)
-    if request.user != profile.user and request.user not in profile.followers.all():
+    if request.user != profile.user and profile.user_id not in following_ids(request.user):
         profile.followers.add(request.user)
     return redirect('view_profile', username=username)
 
 @login_required
 def unfollow_user(request, username):
     profile = get_object_or_404(Profile, user__username=username)
-    if request.user != profile.user and request.user in profile.followers.all():
+    if request.user != profile.user and profile.user_id in following_ids(request.user):
         profile.followers.remove(request.user)
     return redirect('view_profile', username=username)
 
 @login_required
 def followers_list(request, username):
-    user_obj = get_object_or_404(User, username=username)
-    followers = user_obj.profile.followers.all()
+    profile = get_object_or_404(Profile.objects.select_related('user'), user__username=username)
+    try:
+        followers, next_cursor = followers_page(profile, request.GET.get('cursor'))
+    except ValueError:
+        return HttpResponseBadRequest("Invalid cursor")
     return render(request, 'recipes/followers_list.html', {
-        'user_obj': user_obj,
-        'followers': followers,
+        'user_obj': profile.user,
+        'profile': profile,
+        'followers': mark_followed(followers, request.user),
+        'next_cursor': next_cursor,
     })
 
 @login_required
 def following_list(request, username):
-    user_obj = get_object_or_404(User, username=username)
-    following_profiles = user_obj.following.all() 
-    following_users = User.objects.filter(profile__in=following_profiles)  # assuming following is on Profile model
-
+    profile = get_object_or_404(Profile.objects.select_related('user'), user__username=username)
+    try:
+        following_users, next_cursor = following_page(profile.user, request.GET.get('cursor'))
+    except ValueError:
+        return HttpResponseBadRequest("Invalid cursor")
     return render(request, 'recipes/following_list.html', {
-        'user_obj': user_obj,
-        'following_users': following_users,
+        'user_obj': profile.user,
+        'profile': profile,
+        'following_users': mark_followed(following_users, request.user),
+        'next_cursor': next_cursor,
     })
 @require_POST
 @login_required
@@ -645,15 +661,15 @@ def toggle_follow(request, username):
     target_user = get_object_or_404(User, username=username)
     target_profile = get_object_or_404(Profile, user=target_user)
 
-    user_profile = request.user.profile
-
-    if target_profile.followers.filter(id=request.user.id).exists():
+    if target_user.pk in following_ids(request.user):
         target_profile.followers.remove(request.user)
         following = False
     else:
         target_profile.followers.add(request.user)
         following = True
 
+    # ✅ The signal handler updated the counter in the database
+    target_profile.refresh_from_db(fields=['follower_count'])
     return JsonResponse({
         'following': following,
         'followers_count': target_profile.total_followers(),  # optional
@@ -676,14 +692,13 @@ def chef_profile_view(request, username):
         'is_following': is_following,
     })
     
+@condition(etag_func=user_profile_etag, last_modified_func=user_profile_stamp)
 def user_profile(request, user_id):
     profile_user = get_object_or_404(User, id=user_id)
     profile = getattr(profile_user, 'profile', None)
     recipes = Recipe.objects.filter(created_by=profile_user)
 
-    is_following = False
-    if request.user.is_authenticated:
-        is_following = request.user.profile in profile.followers.all() if profile else False
+    is_following = profile_user.pk in following_ids(request.user)
 
     context = {
         'profile_user': profile_user,